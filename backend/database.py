@@ -1,4 +1,6 @@
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event, inspect
+from sqlmodel import SQLModel, Session, create_engine
+from routers.settings import load_settings
 import os
 
 DATABASE_FILE_NAME = "database.db"
@@ -7,7 +9,60 @@ DATABASE_URL = f"sqlite:///../data/{DATABASE_FILE_NAME}"
 # Ensure data directory exists
 os.makedirs("../data", exist_ok=True)
 
-engine = create_engine(DATABASE_URL, echo=True)
+db_settings = load_settings().database
+
+def _make_engine(pool_size: int, read_only: bool = False):
+    engine = create_engine(
+        DATABASE_URL,
+        echo=db_settings.echo,
+        pool_size=pool_size,
+        max_overflow=db_settings.max_overflow,
+        connect_args={
+            "check_same_thread": False,
+            "timeout": db_settings.busy_timeout_ms / 1000
+        }
+    )
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        # WAL lets readers run alongside the import writer
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={db_settings.busy_timeout_ms}")
+        # Negative cache_size is in KiB
+        cursor.execute(f"PRAGMA cache_size=-{db_settings.cache_size_mb * 1024}")
+        cursor.execute(f"PRAGMA mmap_size={db_settings.mmap_size_mb * 1024 * 1024}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        cursor.close()
+
+    return engine
+
+engine = _make_engine(db_settings.pool_size)
+read_engine = _make_engine(db_settings.read_pool_size, read_only=True)
+
+def read_session() -> Session:
+    """Session on the read-only pool, for GET routes"""
+    return Session(read_engine)
+
+def _add_missing_columns():
+    """Add nullable columns introduced since an existing table was created"""
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    connection.exec_driver_sql(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}')
 
 def create_db_and_tables():
     SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, so add columns and indexes introduced since
+    _add_missing_columns()
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
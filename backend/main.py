@@ -2,7 +2,14 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from database import create_db_and_tables
-from routers import files, cloud, ai, items, image, categories, stats, training, settings
+from routers import files, cloud, ai, items, image, categories, stats, training, settings, jobs, derivatives, health
+from routers.settings import load_settings
+from services.import_jobs import import_job_service
+from services.search import search_service
+from services.rclone import rclone_service
+from services.training import training_service
+from services.ai import ai_service
+from services.executor import inference_executor
 import os
 
 app = FastAPI(title="Collectibles Log Book API")
@@ -24,11 +31,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count"],
 )
 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    search_service.ensure_index()
+    # Pick up import jobs interrupted by a crash or restart
+    import_job_service.resume_incomplete_jobs()
+    import_job_service.executor.submit(import_job_service.backfill_hashes)
+    if load_settings().models.warm_up_on_startup:
+        # On the inference thread, so startup is not held up and detections queue behind the load
+        inference_executor.executor.submit(ai_service.warm_up)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    rclone_service.shutdown()
+    # The worker runs in its own process group and would outlive the API
+    training_service.stop_training()
 
 app.include_router(files.router)
 app.include_router(cloud.router)
@@ -39,6 +60,9 @@ app.include_router(categories.router)
 app.include_router(stats.router)
 app.include_router(training.router)
 app.include_router(settings.router)
+app.include_router(jobs.router)
+app.include_router(derivatives.router)
+app.include_router(health.router)
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,5 @@
 from typing import List, Optional
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 from datetime import datetime
 
@@ -20,9 +21,9 @@ class Item(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
     description: Optional[str] = None
-    category_id: Optional[int] = Field(default=None, foreign_key="category.id")
+    category_id: Optional[int] = Field(default=None, foreign_key="category.id", index=True)
     category: Optional[Category] = Relationship(back_populates="items")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
     images: List["Image"] = Relationship(back_populates="item")
     tags: List["Tag"] = Relationship(back_populates="items", link_model=ItemTagLink)
@@ -31,12 +32,75 @@ class Image(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     filename: str
     path: str
-    item_id: Optional[int] = Field(default=None, foreign_key="item.id")
+    item_id: Optional[int] = Field(default=None, foreign_key="item.id", index=True)
     item: Optional[Item] = Relationship(back_populates="images")
     is_primary: bool = Field(default=False)
+    content_hash: Optional[str] = Field(default=None, index=True, unique=True)  # BLAKE2b of the file bytes
+    phash: Optional[str] = None  # 64-bit dHash as hex, for near-duplicate search
+    detections: List["Detection"] = Relationship(back_populates="image")
+
+class Detection(SQLModel, table=True):
+    # Serves "images containing <label> above <confidence>" from the index alone
+    __table_args__ = (Index("ix_detection_label_confidence", "label", "confidence"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    image_id: int = Field(foreign_key="image.id", index=True)
+    image: Optional[Image] = Relationship(back_populates="detections")
+    label: str
+    confidence: float
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    model_key: str  # model path plus a checksum of its weights
 
 class Log(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     action: str
     details: str
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+class ImportJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="queued", index=True)  # queued, running, completed, failed
+    category_name: Optional[str] = None
+    delete_original: bool = Field(default=False)
+    batch_size: Optional[int] = None
+    on_duplicate: Optional[str] = Field(default="skip")  # skip, link
+    source: Optional[str] = None  # rclone remote folder for cloud imports, e.g. "gdrive:photos"
+    transfers: Optional[int] = None
+    total: int = Field(default=0)
+    processed: int = Field(default=0)
+    imported: int = Field(default=0)
+    failed: int = Field(default=0)
+    elapsed_seconds: float = Field(default=0.0)
+    detect_seconds: float = Field(default=0.0)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ImportJobFile(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: int = Field(foreign_key="importjob.id", index=True)
+    position: int
+    path: str
+    source: Optional[str] = None  # remote object the file at `path` is staged from
+    status: str = Field(default="pending", index=True)  # pending, done, linked, skipped, failed
+    item_id: Optional[int] = None
+    detections: int = Field(default=0)
+    error: Optional[str] = None
+
+class DetectionCacheEntry(SQLModel, table=True):
+    content_hash: str = Field(primary_key=True)
+    model_key: str = Field(primary_key=True)  # model path plus a checksum of its weights
+    confidence: float = Field(primary_key=True)
+    detections: str  # JSON list of detections
+    last_used: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class ScanManifestEntry(SQLModel, table=True):
+    path: str = Field(primary_key=True)
+    size: int
+    mtime_ns: int
+    content_hash: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,23 +1,40 @@
 import requests
-import os
+import json
+import time
 
 API_URL = "http://127.0.0.1:8000"
 SOURCE_DIR = r"I:\C&D PHOTOS\phil"
+POLL_INTERVAL = 2  # seconds
 
-def process_images():
-    # 1. Get list of image files
+def scan_changed_images():
+    """Stream the server's scan of SOURCE_DIR, keeping only files that are new or changed since the last import"""
     image_files = []
-    if os.path.exists(SOURCE_DIR):
-        for root, dirs, files in os.walk(SOURCE_DIR):
-            for file in files:
-                if file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp')):
-                    image_files.append(os.path.join(root, file))
-    else:
-        print(f"Directory not found: {SOURCE_DIR}")
+    with requests.get(
+        f"{API_URL}/files/scan",
+        params={"path": SOURCE_DIR, "changed_only": "true"},
+        stream=True
+    ) as response:
+        if response.status_code != 200:
+            print(f"Scan failed: {response.status_code} - {response.text}")
+            return None
+        for line in response.iter_lines():
+            if not line:
+                continue
+            entry = json.loads(line)
+            if entry["type"] == "file":
+                image_files.append(entry["path"])
+            elif entry["type"] == "error":
+                print(f"Skipped {entry['path']}: {entry['error']}")
+    return image_files
+
+def process_images():
+    # 1. Get new or changed image files; files imported by earlier runs are skipped
+    image_files = scan_changed_images()
+    if image_files is None:
         return
 
     with open("output.log", "w") as log:
-        log.write(f"Found {len(image_files)} images.\n")
+        log.write(f"Found {len(image_files)} new or changed images.\n")
         
         if not image_files:
             log.write("No images found to process.\n")
@@ -36,13 +53,24 @@ def process_images():
         try:
             response = requests.post(f"{API_URL}/items/import", data=payload)
             
-            if response.status_code == 200:
-                result = response.json()
-                log.write(f"Success! Imported {result.get('imported_count')} items.\n")
-                for item in result.get('items', []):
-                    log.write(f" - Imported: {item['name']} (ID: {item['item_id']})\n")
-            else:
+            if response.status_code != 200:
                 log.write(f"Error: {response.status_code} - {response.text}\n")
+                return
+
+            job_id = response.json()["job_id"]
+            log.write(f"Queued import job {job_id}.\n")
+
+            # 3. Poll the job until it finishes
+            while True:
+                job = requests.get(f"{API_URL}/jobs/{job_id}").json()
+                print(f"Job {job_id}: {job['processed']}/{job['total']} ({job['images_per_sec']} images/sec)")
+                if job["status"] in ("completed", "failed"):
+                    break
+                time.sleep(POLL_INTERVAL)
+
+            log.write(f"Job {job['status']}: imported {job['imported']} items, {job['failed']} failed.\n")
+            if job.get("error"):
+                log.write(f"Error: {job['error']}\n")
                 
         except Exception as e:
             log.write(f"Failed to send request: {e}\n")
@@ -1,14 +1,38 @@
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, computed_field
 from datetime import datetime
 
 # Response models for API serialization
+class DetectionResponse(BaseModel):
+    id: int
+    label: str
+    confidence: float
+    x1: float
+    y1: float
+    x2: float
+    y2: float
+    model_key: str
+
+    class Config:
+        from_attributes = True
+
 class ImageResponse(BaseModel):
     id: int
     filename: str
     path: str
     item_id: Optional[int]
     is_primary: bool
+    detections: List[DetectionResponse] = []
+
+    @computed_field
+    @property
+    def thumbnail_url(self) -> str:
+        return f"/derivatives/{self.id}/thumb"
+
+    @computed_field
+    @property
+    def preview_url(self) -> str:
+        return f"/derivatives/{self.id}/preview"
 
     class Config:
         from_attributes = True
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from services.ai import ai_service
+from services.batching import detect_batcher
+from services.executor import cpu_executor, remove_background as remove_background_task
 from fastapi.responses import Response
 
 router = APIRouter(
@@ -11,16 +12,25 @@ router = APIRouter(
 async def detect_objects(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        detections = ai_service.detect_objects(contents)
+        detections = await detect_batcher.detect(contents)
         return detections
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/batching")
+def get_batching_stats():
+    """Batch sizes and queue depths seen by the /ai/detect scheduler"""
+    return detect_batcher.get_stats()
+
 @router.post("/remove-bg")
 async def remove_background(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        processed_image = ai_service.remove_background(contents)
+        processed_image = await cpu_executor.run(remove_background_task, contents)
         return Response(content=processed_image, media_type="image/png")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
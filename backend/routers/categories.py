@@ -1,8 +1,9 @@
 from fastapi import APIRouter, HTTPException
 from sqlmodel import Session, select
 from typing import List
-from database import engine
+from database import engine, read_session
 from models import Category
+from services.stats import stats_service
 
 router = APIRouter(
     prefix="/categories",
@@ -12,7 +13,7 @@ router = APIRouter(
 @router.get("/", response_model=List[Category])
 def list_categories():
     """List all categories"""
-    with Session(engine) as session:
+    with read_session() as session:
         statement = select(Category)
         categories = session.exec(statement).all()
         return categories
@@ -31,6 +32,7 @@ def create_category(name: str):
         session.add(category)
         session.commit()
         session.refresh(category)
+        stats_service.record_category_created(category)
         return category
 
 @router.delete("/{category_id}")
@@ -43,4 +45,5 @@ def delete_category(category_id: int):
         
         session.delete(category)
         session.commit()
+        stats_service.record_category_deleted(category_id)
         return {"success": True, "message": f"Category {category_id} deleted"}
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from typing import List, Any, Dict
-from services.rclone import rclone_service
+from fastapi import APIRouter, HTTPException, Form, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import List, Any, Dict, Literal, Optional, Tuple
+from services.rclone import rclone_service, cloud_settings
+from services.cloud_cache import cloud_file_cache
+from services.import_jobs import import_job_service
+import mimetypes
 import subprocess
-import io
 
 router = APIRouter(
     prefix="/cloud",
@@ -14,54 +17,126 @@ router = APIRouter(
 def list_remotes() -> List[Dict[str, str]]:
     """List configured Rclone remotes with their types"""
     try:
-        remotes = rclone_service.list_remotes()
-        result = []
-        for remote in remotes:
-            # Get remote type
-            try:
-                config_output = subprocess.run(
-                    ["rclone", "config", "show", remote],
-                    capture_output=True,
-                    text=True
-                )
-                remote_type = "unknown"
-                for line in config_output.stdout.split('\n'):
-                    if line.startswith('type ='):
-                        remote_type = line.split('=')[1].strip()
-                        break
-                
-                result.append({"name": remote, "type": remote_type})
-            except:
-                result.append({"name": remote, "type": "unknown"})
-        return result
+        return rclone_service.list_remote_types()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/files", response_model=List[Any])
-def list_cloud_files(remote: str, path: str = ""):
+def list_cloud_files(remote: str, path: str = "", refresh: bool = False):
+    """List a cloud directory; listings are cached briefly unless `refresh` is set"""
     try:
-        return rclone_service.list_files(remote, path)
+        return rclone_service.list_files(remote, path, refresh=refresh)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/serve")
-async def serve_cloud_file(remote: str, path: str):
-    """Stream a file from cloud storage"""
+@router.post("/cache/invalidate")
+def invalidate_cloud_cache(remote: Optional[str] = None, path: Optional[str] = None):
+    """Drop cached remote configs and listings, e.g. after changing files outside the app"""
+    rclone_service.invalidate(remote, path)
+    return {"success": True}
+
+@router.post("/import")
+def import_cloud_folder(
+    remote: str = Form(...),
+    path: str = Form(""),
+    category_name: Optional[str] = Form(None),
+    batch_size: Optional[int] = Form(None),
+    on_duplicate: Literal["skip", "link"] = Form("skip"),
+    transfers: Optional[int] = Form(None)
+):
+    """
+    Queue a server-side import of every image below a remote folder.
+    Files are copied `transfers` at a time into a staging area and fed
+    straight into the import pipeline; an interrupted job resumes with the
+    files it had not committed. Poll `GET /jobs/{job_id}` for progress.
+    """
     try:
-        # Use rclone cat to stream the file
-        process = subprocess.Popen(
-            ["rclone", "cat", f"{remote}:{path}"],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
+        job_id, total = import_job_service.create_cloud_job(
+            remote,
+            path,
+            category_name=category_name,
+            batch_size=batch_size,
+            on_duplicate=on_duplicate,
+            transfers=transfers or cloud_settings.transfers
         )
-        
-        def generate():
+        return {"success": True, "job_id": job_id, "total": total}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _parse_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """(start, end) inclusive for a single "bytes=" range, None to send the whole file"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if first:
+            start, end = int(first), int(last) if last else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+@router.get("/serve")
+async def serve_cloud_file(request: Request, remote: str, path: str):
+    """
+    Serve a file from cloud storage with its real Content-Type and length.
+    Byte ranges are honoured: `rclone cat` streams just the requested
+    range. With the serve cache enabled, the file is also copied to local
+    disk in the background and later requests are served from there, so
+    repeated previews do not touch the remote.
+    """
+    try:
+        item = await run_in_threadpool(rclone_service.stat, remote, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="File not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    size = item["Size"]
+    media_type = item.get("MimeType") or mimetypes.guess_type(path)[0] or "application/octet-stream"
+    
+    if cloud_settings.serve_cache:
+        mod_time = item.get("ModTime", "")
+        local_path = cloud_file_cache.get(remote, path, size, mod_time)
+        if local_path:
+            # FileResponse handles Range itself
+            return FileResponse(local_path, media_type=media_type)
+        # This request streams its range now rather than waiting for the whole file
+        cloud_file_cache.prefetch(remote, path, size, mod_time)
+    
+    byte_range = _parse_range(request.headers.get("range"), size)
+    start, end = byte_range or (0, size - 1)
+    headers = {"Accept-Ranges": "bytes", "Content-Length": str(end - start + 1)}
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    process = subprocess.Popen(
+        rclone_service.cat_command(remote, path, offset=start, count=end - start + 1),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL
+    )
+    read_size = cloud_settings.serve_read_size_kb * 1024
+    
+    async def generate():
+        try:
             while True:
-                chunk = process.stdout.read(8192)
+                chunk = await run_in_threadpool(process.stdout.read, read_size)
                 if not chunk:
                     break
                 yield chunk
-        
-        return StreamingResponse(generate(), media_type="application/octet-stream")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        finally:
+            # Runs on completion and when the client disconnects mid-stream
+            if process.poll() is None:
+                process.kill()
+            await run_in_threadpool(process.wait)
+    
+    return StreamingResponse(
+        generate(),
+        status_code=206 if byte_range else 200,
+        media_type=media_type,
+        headers=headers
+    )
@@ -0,0 +1,39 @@
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse
+from database import read_session
+from models import Image
+from services.import_jobs import LOG_DIR
+from services.thumbnails import thumbnail_service, DERIVATIVE_SIZES
+
+router = APIRouter(
+    prefix="/derivatives",
+    tags=["derivatives"],
+)
+
+CACHE_CONTROL = "public, max-age=86400"
+
+@router.get("/{image_id}/{size}")
+def get_derivative(image_id: int, size: str, request: Request):
+    """Serve a thumbnail or preview of an image, generating it on first request"""
+    if size not in DERIVATIVE_SIZES:
+        raise HTTPException(status_code=404, detail=f"Unknown size. Use one of: {', '.join(DERIVATIVE_SIZES)}")
+
+    with read_session() as session:
+        image = session.get(Image, image_id)
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+        source_path = LOG_DIR / image.filename
+
+    if not source_path.exists():
+        raise HTTPException(status_code=404, detail="Image file not found")
+
+    try:
+        path, etag = thumbnail_service.get_derivative(str(source_path), size)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type=thumbnail_service.media_type, headers=headers)
@@ -2,7 +2,9 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import os
 from typing import List
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+import json
+from services.scanner import scanner_service
 
 router = APIRouter(
     prefix="/files",
@@ -40,6 +42,26 @@ def list_files(path: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/scan")
+def scan_files(path: str, recursive: bool = True, changed_only: bool = False, include_dirs: bool = False):
+    """
+    Stream the image files under a directory as NDJSON, one object per line,
+    while the tree is walked. Each file carries a `status` of new, changed or
+    unchanged relative to what was already imported; `changed_only` omits
+    unchanged files. Unreadable directories produce `"type": "error"` lines.
+    """
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Directory not found")
+    
+    if not os.path.isdir(path):
+        raise HTTPException(status_code=400, detail="Path is not a directory")
+    
+    lines = (
+        json.dumps(entry) + "\n"
+        for entry in scanner_service.scan(path, recursive=recursive, changed_only=changed_only, include_dirs=include_dirs)
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
 @router.get("/serve")
 def serve_file(path: str):
     """Serve a local file for preview"""
@@ -0,0 +1,28 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from services.ai import ai_service
+
+router = APIRouter(
+    prefix="/health",
+    tags=["health"],
+)
+
+@router.get("/live")
+def liveness():
+    """The API process is up and serving requests"""
+    return {"status": "ok"}
+
+@router.get("/ready")
+def readiness():
+    """200 once the detection model is loaded, 503 while it is cold, loading or failed to load"""
+    body = {
+        "ready": ai_service.is_ready,
+        "model_state": ai_service.state,
+        "model": ai_service.model_path,
+        "backend": ai_service.backend,
+        "load_seconds": ai_service.load_seconds,
+        "pending_model": ai_service.pending_model,
+        "last_load_error": ai_service.last_load_error,
+        "loaded_models": ai_service.registry.keys()
+    }
+    return JSONResponse(body, status_code=200 if ai_service.is_ready else 503)
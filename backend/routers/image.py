@@ -1,19 +1,56 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Form
 from fastapi.responses import Response
-from services.image_processing import image_processing_service
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+from typing import Literal, Optional
+from services.executor import cpu_executor, image_operation
+import json
 
 router = APIRouter(
     prefix="/image",
     tags=["image"],
 )
 
+# Parameters each pipeline operation requires, and those it also accepts
+OPERATION_PARAMS = {
+    "enhance": ((), ()),
+    "crop": (("x", "y", "width", "height"), ()),
+    "smart_crop": ((), ()),
+    "auto_crop": ((), ()),
+    "resize": ((), ("max_width", "max_height")),
+}
+
+class PipelineOperation(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    op: Literal["enhance", "crop", "smart_crop", "auto_crop", "resize"]
+    x: Optional[int] = Field(default=None, ge=0)
+    y: Optional[int] = Field(default=None, ge=0)
+    width: Optional[int] = Field(default=None, gt=0)
+    height: Optional[int] = Field(default=None, gt=0)
+    max_width: Optional[int] = Field(default=None, gt=0)
+    max_height: Optional[int] = Field(default=None, gt=0)
+
+    @model_validator(mode="after")
+    def check_params(self):
+        required, optional = OPERATION_PARAMS[self.op]
+        given = {name for name, value in self if name != "op" and value is not None}
+        missing = [name for name in required if name not in given]
+        if missing:
+            raise ValueError(f"{self.op} requires {', '.join(missing)}")
+        unexpected = sorted(given - set(required) - set(optional))
+        if unexpected:
+            raise ValueError(f"{self.op} does not take {', '.join(unexpected)}")
+        return self
+
 @router.post("/enhance")
 async def enhance_image(file: UploadFile = File(...)):
     """Enhance image quality (brightness, contrast, sharpness)"""
     try:
         contents = await file.read()
-        enhanced = image_processing_service.enhance_image(contents)
+        enhanced = await cpu_executor.run(image_operation, "enhance_image", contents)
         return Response(content=enhanced, media_type="image/png")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -28,8 +65,10 @@ async def crop_image(
     """Crop image to specified coordinates"""
     try:
         contents = await file.read()
-        cropped = image_processing_service.crop_image(contents, x, y, width, height)
+        cropped = await cpu_executor.run(image_operation, "crop_image", contents, x, y, width, height)
         return Response(content=cropped, media_type="image/png")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -38,8 +77,10 @@ async def smart_crop(file: UploadFile = File(...)):
     """Smart crop using edge detection"""
     try:
         contents = await file.read()
-        cropped = image_processing_service.smart_crop(contents)
+        cropped = await cpu_executor.run(image_operation, "smart_crop", contents)
         return Response(content=cropped, media_type="image/png")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -48,8 +89,10 @@ async def auto_crop(file: UploadFile = File(...)):
     """Auto-crop to remove white/transparent borders"""
     try:
         contents = await file.read()
-        cropped = image_processing_service.auto_crop(contents)
+        cropped = await cpu_executor.run(image_operation, "auto_crop", contents)
         return Response(content=cropped, media_type="image/png")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -62,7 +105,38 @@ async def resize_image(
     """Resize image while maintaining aspect ratio"""
     try:
         contents = await file.read()
-        resized = image_processing_service.resize_image(contents, max_width, max_height)
+        resized = await cpu_executor.run(image_operation, "resize_image", contents, max_width, max_height)
         return Response(content=resized, media_type="image/png")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/pipeline")
+async def run_pipeline(
+    file: UploadFile = File(...),
+    operations: str = Form(...),
+    format: Literal["png", "jpeg", "webp"] = Form("png"),
+    quality: int = Form(90)
+):
+    """
+    Apply an ordered list of operations with a single decode and encode.
+    `operations` is a JSON list such as
+    [{"op": "auto_crop"}, {"op": "resize", "max_width": 800}, {"op": "enhance"}]
+    """
+    try:
+        steps = [
+            PipelineOperation(**step).dict(exclude_none=True)
+            for step in json.loads(operations)
+        ]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid operations: {e}")
+
+    try:
+        contents = await file.read()
+        output, media_type = await cpu_executor.run(image_operation, "run_pipeline", contents, steps, format, quality)
+        return Response(content=output, media_type=media_type)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
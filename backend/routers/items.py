@@ -1,13 +1,20 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form
+from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Response
+from sqlalchemy import tuple_, delete, update, insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload, joinedload
 from sqlmodel import Session, select
-from typing import List, Optional
-import shutil
+from typing import List, Literal, Optional
 import os
-from pathlib import Path
-from database import engine
-from models import Item, Image, Category, Tag, ItemTagLink, Log
+import base64
+from database import engine, read_session
+from models import Item, Image, Category, ItemTagLink, Log, Detection
 from response_models import ItemResponse
-from services.ai import ai_service
+from services.ai import ai_service, detection_rows
+from services.import_jobs import import_job_service
+from services.stats import stats_service
+from services.executor import inference_executor
+from services.phash import phash_index
+from services.search import search_service
 from datetime import datetime
 
 router = APIRouter(
@@ -15,174 +22,208 @@ router = APIRouter(
     tags=["items"],
 )
 
-# Ensure log directory exists
-LOG_DIR = Path("../data/logs")
-LOG_DIR.mkdir(parents=True, exist_ok=True)
-
 @router.post("/import")
-async def import_items(
+def import_items(
     files: List[str] = Form(...),
     category_name: Optional[str] = Form(None),
     delete_original: bool = Form(False),
-    batch_process: bool = Form(True)
+    batch_process: bool = Form(True),
+    batch_size: Optional[int] = Form(None),
+    on_duplicate: Literal["skip", "link"] = Form("skip")
 ):
     """
-    Import items from local file paths.
-    - Copies images to log directory
-    - Runs AI detection
-    - Creates database records
-    - Optionally deletes originals
+    Queue an import of local file paths as a background job.
+    The job copies images to the log directory, runs AI detection in
+    mini-batches of `batch_size` images, creates database records and
+    optionally deletes originals. Poll `GET /jobs/{job_id}` for progress.
+    Files whose content is already stored are not decoded or run through
+    detection; `on_duplicate` either skips them or links them to the
+    existing item (which also allows deleting the original).
     """
-    imported_items = []
-    
-    with Session(engine) as session:
-        # Get or create category
-        category = None
-        if category_name:
-            statement = select(Category).where(Category.name == category_name)
-            category = session.exec(statement).first()
-            if not category:
-                category = Category(name=category_name)
-                session.add(category)
-                session.commit()
-                session.refresh(category)
-        
-        for file_path in files:
-            try:
-                if not os.path.exists(file_path):
-                    continue
-                
-                # Read file for AI processing
-                with open(file_path, 'rb') as f:
-                    file_bytes = f.read()
-                
-                # Run AI detection
-                detections = ai_service.detect_objects(file_bytes)
-                
-                # Determine item name from detections or filename
-                if detections:
-                    primary_label = detections[0]['label']
-                    item_name = f"{primary_label} - {Path(file_path).stem}"
-                else:
-                    item_name = Path(file_path).stem
-                
-                # Create item
-                item = Item(
-                    name=item_name,
-                    description=f"Detected objects: {', '.join([d['label'] for d in detections])}",
-                    category_id=category.id if category else None
-                )
-                session.add(item)
-                session.commit()
-                session.refresh(item)
-                
-                # Copy file to log directory
-                filename = f"{item.id}_{Path(file_path).name}"
-                dest_path = LOG_DIR / filename
-                shutil.copy2(file_path, dest_path)
-                
-                # Create image record
-                image = Image(
-                    filename=filename,
-                    path=str(dest_path),
-                    item_id=item.id,
-                    is_primary=True
-                )
-                session.add(image)
-                
-                # Create tags from detections
-                unique_labels = set(d['label'] for d in detections)
-                for tag_name in unique_labels:
-                    statement = select(Tag).where(Tag.name == tag_name)
-                    tag = session.exec(statement).first()
-                    if not tag:
-                        tag = Tag(name=tag_name)
-                        session.add(tag)
-                        session.commit()
-                        session.refresh(tag)
-                    
-                    # Link tag to item
-                    # Check if link already exists (should not for new item, but good practice)
-                    link = ItemTagLink(item_id=item.id, tag_id=tag.id)
-                    session.add(link)
-                
-                # Log the import
-                log = Log(
-                    action="import",
-                    details=f"Imported {filename} with {len(detections)} detections"
-                )
-                session.add(log)
-                
-                session.commit()
-                
-                # Delete original if requested
-                if delete_original:
-                    os.remove(file_path)
-                    log_delete = Log(
-                        action="delete_original",
-                        details=f"Deleted original file: {file_path}"
-                    )
-                    session.add(log_delete)
-                    session.commit()
-                
-                imported_items.append({
-                    "item_id": item.id,
-                    "name": item_name,
-                    "detections": len(detections),
-                    "image_path": str(dest_path)
-                })
-                
-            except Exception as e:
-                with open("backend_errors.log", "a") as err_log:
-                    err_log.write(f"Error importing {file_path}: {e}\n")
-                print(f"Error importing {file_path}: {e}")
-                continue
-    
+    job_id = import_job_service.create_job(
+        files,
+        category_name=category_name,
+        delete_original=delete_original,
+        batch_size=batch_size,
+        on_duplicate=on_duplicate
+    )
     return {
         "success": True,
-        "imported_count": len(imported_items),
-        "items": imported_items
+        "job_id": job_id,
+        "total": len(files)
     }
 
+@router.post("/consolidate")
+def consolidate_items(max_distance: int = 6, dry_run: bool = True):
+    """
+    Cluster near-duplicate photos by perceptual hash and merge each cluster
+    into its oldest item. With dry_run (the default) only the clusters are
+    returned.
+    """
+    with Session(engine) as session:
+        image_items = dict(session.exec(select(Image.id, Image.item_id).where(Image.phash.is_not(None))).all())
+        
+        # Several near-identical images of one item are not a merge candidate on their own
+        clusters = []
+        for image_ids in phash_index.clusters(max_distance):
+            item_ids = sorted({image_items[image_id] for image_id in image_ids if image_items.get(image_id)})
+            if len(item_ids) > 1:
+                clusters.append(item_ids)
+        
+        if dry_run:
+            return {"success": True, "dry_run": True, "clusters": clusters}
+        
+        merged = 0
+        for item_ids in clusters:
+            target_id, source_ids = item_ids[0], item_ids[1:]
+            categories = dict(session.exec(select(Item.id, Item.category_id).where(Item.id.in_(source_ids))).all())
+            
+            # Move images and tag links onto the target item, then drop the merged items
+            session.execute(
+                update(Image).where(Image.item_id.in_(source_ids)).values(item_id=target_id, is_primary=False)
+            )
+            tag_ids = session.exec(select(ItemTagLink.tag_id).where(ItemTagLink.item_id.in_(source_ids))).all()
+            if tag_ids:
+                session.execute(
+                    sqlite_insert(ItemTagLink).on_conflict_do_nothing(),
+                    [{"item_id": target_id, "tag_id": tag_id} for tag_id in set(tag_ids)]
+                )
+            session.execute(delete(ItemTagLink).where(ItemTagLink.item_id.in_(source_ids)))
+            session.execute(delete(Item).where(Item.id.in_(source_ids)))
+            session.add(Log(
+                action="consolidate",
+                details=f"Merged items {', '.join(map(str, source_ids))} into item {target_id}"
+            ))
+            session.commit()
+            
+            for source_id in source_ids:
+                stats_service.record_item_deleted(categories.get(source_id))
+            merged += len(source_ids)
+        
+        return {"success": True, "dry_run": False, "clusters": clusters, "merged_items": merged}
+
+def _encode_cursor(item: Item) -> str:
+    return base64.urlsafe_b64encode(f"{item.created_at.isoformat()}|{item.id}".encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, item_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @router.get("/", response_model=List[ItemResponse])
 def list_items(
+    response: Response,
     category: Optional[str] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    label: Optional[str] = None,
+    min_confidence: float = 0.0
 ):
-    """List all items with optional category filter"""
-    with Session(engine) as session:
-        statement = select(Item)
+    """
+    List all items with optional category filter.
+    With `label`, only items with an image containing that detected label
+    at `min_confidence` or above are returned.
+    Pass `cursor` (empty for the first page) to page by (created_at, id)
+    instead of OFFSET; the next page's cursor is returned in the
+    X-Next-Cursor header.
+    """
+    with read_session() as session:
+        # Images and category load in a fixed number of queries instead of two per item
+        statement = select(Item).options(
+            selectinload(Item.images).selectinload(Image.detections),
+            joinedload(Item.category)
+        )
         
         if category:
             statement = statement.join(Category).where(Category.name == category)
         
-        statement = statement.offset(skip).limit(limit)
+        if label:
+            # Answered from the (label, confidence) index
+            statement = statement.where(Item.id.in_(
+                select(Image.item_id)
+                .join(Detection, Detection.image_id == Image.id)
+                .where(Detection.label == label, Detection.confidence >= min_confidence)
+            ))
+        
+        if cursor is not None:
+            statement = statement.order_by(Item.created_at, Item.id)
+            if cursor:
+                statement = statement.where(tuple_(Item.created_at, Item.id) > _decode_cursor(cursor))
+            statement = statement.limit(limit)
+        else:
+            statement = statement.offset(skip).limit(limit)
         items = session.exec(statement).all()
         
-        # Eagerly load relationships
-        result = []
-        for item in items:
-            _ = item.images  # Trigger lazy load
-            _ = item.category  # Trigger lazy load
-            result.append(ItemResponse.from_orm(item))
+        if cursor is not None and len(items) == limit:
+            response.headers["X-Next-Cursor"] = _encode_cursor(items[-1])
         
-        return result
+        return [ItemResponse.from_orm(item) for item in items]
+
+@router.get("/search", response_model=List[ItemResponse])
+def search_items(response: Response, q: str, limit: int = 50, offset: int = 0):
+    """
+    Full-text search over item names, descriptions, tags and categories.
+    Every word must match (as a prefix); results are ranked by relevance
+    and the total number of matches is returned in the X-Total-Count header.
+    """
+    item_ids, total = search_service.search(q, limit=limit, offset=offset)
+    response.headers["X-Total-Count"] = str(total)
+    if not item_ids:
+        return []
+    
+    with read_session() as session:
+        items = session.exec(
+            select(Item)
+            .options(selectinload(Item.images).selectinload(Image.detections), joinedload(Item.category))
+            .where(Item.id.in_(item_ids))
+        ).all()
+        by_id = {item.id: item for item in items}
+        return [ItemResponse.from_orm(by_id[item_id]) for item_id in item_ids if item_id in by_id]
 
 @router.get("/{item_id}", response_model=ItemResponse)
 def get_item(item_id: int):
     """Get a single item with all its images and tags"""
-    with Session(engine) as session:
-        item = session.get(Item, item_id)
+    with read_session() as session:
+        item = session.get(Item, item_id, options=[
+            selectinload(Item.images).selectinload(Image.detections),
+            joinedload(Item.category)
+        ])
         if not item:
             raise HTTPException(status_code=404, detail="Item not found")
         
-        # Eagerly load relationships
-        _ = item.images
-        _ = item.category
-        
         return ItemResponse.from_orm(item)
 
+@router.get("/{item_id}/similar")
+def find_similar_items(item_id: int, max_distance: int = 10):
+    """Find images of other items that look like this item's images"""
+    with read_session() as session:
+        item = session.get(Item, item_id, options=[selectinload(Item.images)])
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        
+        matches = {}
+        for image in item.images:
+            if not image.phash:
+                continue
+            for distance, image_id in phash_index.find_similar(image.phash, max_distance):
+                if image_id not in matches or distance < matches[image_id]:
+                    matches[image_id] = distance
+        
+        if not matches:
+            return []
+        image_items = dict(session.exec(select(Image.id, Image.item_id).where(Image.id.in_(matches))).all())
+        return sorted(
+            (
+                {"item_id": image_items[image_id], "image_id": image_id, "distance": distance}
+                for image_id, distance in matches.items()
+                if image_items.get(image_id) not in (None, item_id)
+            ),
+            key=lambda match: match["distance"]
+        )
+
 @router.put("/{item_id}")
 def update_item(
     item_id: int,
@@ -200,6 +241,7 @@ def update_item(
             item.name = name
         if description:
             item.description = description
+        old_category_id = item.category_id
         if category_id:
             item.category_id = category_id
         
@@ -207,6 +249,7 @@ def update_item(
         session.add(item)
         session.commit()
         session.refresh(item)
+        stats_service.record_item_updated(old_category_id, item.category_id)
         
         return item
 
@@ -218,13 +261,21 @@ def delete_item(item_id: int):
         if not item:
             raise HTTPException(status_code=404, detail="Item not found")
         
-        # Delete associated image files
+        # Delete associated image files, and their rows so their content can be imported again
+        image_ids = [image.id for image in item.images]
+        if image_ids:
+            session.execute(delete(Detection).where(Detection.image_id.in_(image_ids)))
         for image in item.images:
             if os.path.exists(image.path):
                 os.remove(image.path)
+            session.delete(image)
         
+        category_id = item.category_id
         session.delete(item)
         session.commit()
+        stats_service.record_item_deleted(category_id, len(image_ids))
+        if image_ids:
+            phash_index.invalidate()
         
         return {"success": True, "message": f"Item {item_id} deleted"}
 
@@ -236,13 +287,25 @@ async def reprocess_item(item_id: int):
         if not item:
             raise HTTPException(status_code=404, detail="Item not found")
         
-        detections_all = []
+        images = []
         for image in item.images:
             if os.path.exists(image.path):
                 with open(image.path, 'rb') as f:
-                    file_bytes = f.read()
-                detections = ai_service.detect_objects(file_bytes)
-                detections_all.extend(detections)
+                    images.append((image.id, f.read()))
+        
+        results = await inference_executor.run(ai_service.detect_objects_batch, [data for _, data in images])
+        detections_all = [detection for detections in results for detection in detections]
+        
+        # Replace the stored detections of the reprocessed images
+        image_ids = [image_id for image_id, _ in images]
+        session.execute(delete(Detection).where(Detection.image_id.in_(image_ids)))
+        rows = [
+            row
+            for image_id, detections in zip(image_ids, results)
+            for row in detection_rows(image_id, detections, ai_service.model_key)
+        ]
+        if rows:
+            session.execute(insert(Detection), rows)
         
         # Update description
         item.description = f"Detected objects: {', '.join([d['label'] for d in detections_all])}"
@@ -252,5 +315,6 @@ async def reprocess_item(item_id: int):
         
         return {
             "success": True,
-            "detections": detections_all
+            "detections": detections_all,
+            "images_per_sec": ai_service.last_batch_stats["images_per_sec"]
         }
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, HTTPException
+from services.import_jobs import import_job_service
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["jobs"],
+)
+
+@router.get("/")
+def list_jobs(limit: int = 20):
+    """List the most recent import jobs"""
+    return import_job_service.list_jobs(limit)
+
+@router.get("/{job_id}")
+def get_job(job_id: int, include_files: bool = False):
+    """Get progress and throughput of an import job"""
+    job = import_job_service.get_job(job_id, include_files=include_files)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
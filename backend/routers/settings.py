@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional
+from typing import Literal, Optional
 import json
 import os
 
@@ -16,6 +16,14 @@ class ModelSettings(BaseModel):
     detection_confidence: float = 0.25
     custom_model_path: Optional[str] = None
     use_custom_model: bool = False
+    inference_batch_size: int = 8
+    warm_up_on_startup: bool = True  # load the model in the background instead of on the first detection
+    loaded_models: int = 2  # recently used models kept in memory for instant switching
+    inference_backend: Literal["pytorch", "onnx"] = "pytorch"  # onnx runs an export cached next to the weights
+    onnx_quantize_int8: bool = False
+    onnx_intra_op_threads: int = 0  # 0 lets onnxruntime choose
+    onnx_inter_op_threads: int = 0
+    onnx_provider: str = "CPUExecutionProvider"  # e.g. OpenVINOExecutionProvider with onnxruntime-openvino
 
 class EbaySettings(BaseModel):
     app_id: str = ""
@@ -24,9 +32,38 @@ class EbaySettings(BaseModel):
     user_token: str = ""
     sandbox_mode: bool = True
 
+class DatabaseSettings(BaseModel):
+    echo: bool = False
+    pool_size: int = 5
+    max_overflow: int = 10
+    read_pool_size: int = 10
+    busy_timeout_ms: int = 5000
+    cache_size_mb: int = 64
+    mmap_size_mb: int = 256
+
+class ExecutorSettings(BaseModel):
+    process_workers: int = 2
+    max_pending_cpu: int = 8
+    max_pending_inference: int = 16
+    retry_after_seconds: int = 2
+    detect_max_batch: int = 8  # concurrent /ai/detect requests run together as one batch
+    detect_max_wait_ms: float = 5.0  # how long the first request waits for others to join its batch
+
+class CloudSettings(BaseModel):
+    rclone_path: str = "rclone"
+    rc_port: int = 0  # 0 picks a free port
+    cache_ttl_seconds: float = 60.0
+    transfers: int = 4
+    serve_read_size_kb: int = 256
+    serve_cache: bool = False  # also keep served files on local disk for repeated previews
+    serve_cache_max_mb: int = 1024
+
 class Settings(BaseModel):
     models: ModelSettings = ModelSettings()
     ebay: EbaySettings = EbaySettings()
+    database: DatabaseSettings = DatabaseSettings()
+    executor: ExecutorSettings = ExecutorSettings()
+    cloud: CloudSettings = CloudSettings()
 
 def load_settings() -> Settings:
     """Load settings from file or return defaults"""
@@ -60,12 +97,24 @@ def update_model_settings(model_settings: ModelSettings):
         
         # Update the AI service model
         from services.ai import ai_service
-        ai_service.reload_model(
+        ai_service.registry.max_models = max(1, model_settings.loaded_models)
+        ai_service.session_options = {
+            "intra_op_threads": model_settings.onnx_intra_op_threads,
+            "inter_op_threads": model_settings.onnx_inter_op_threads,
+            "provider": model_settings.onnx_provider
+        }
+        model_status = ai_service.reload_model(
             model_path=model_settings.custom_model_path if model_settings.use_custom_model else model_settings.detection_model,
-            confidence=model_settings.detection_confidence
+            confidence=model_settings.detection_confidence,
+            batch_size=model_settings.inference_batch_size,
+            backend=model_settings.inference_backend,
+            quantize=model_settings.onnx_quantize_int8
         )
         
-        return {"message": "Model settings updated successfully"}
+        if model_status == "loading":
+            # The current model keeps serving until the new one is loaded and warm
+            return {"message": "Model settings saved; the new model is loading in the background", "model_status": model_status}
+        return {"message": "Model settings updated successfully", "model_status": model_status}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -79,3 +128,14 @@ def update_ebay_settings(ebay_settings: EbaySettings):
         return {"message": "eBay settings updated successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/database")
+def update_database_settings(database_settings: DatabaseSettings):
+    """Update database engine settings (applied on next server start)"""
+    try:
+        settings = load_settings()
+        settings.database = database_settings
+        save_settings(settings)
+        return {"message": "Database settings saved. Restart the server to apply them."}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
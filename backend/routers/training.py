@@ -1,6 +1,9 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from services.training import training_service
+import asyncio
+import json
 import os
 
 router = APIRouter(
@@ -36,15 +39,39 @@ def start_training(config: TrainingConfig):
 
 @router.post("/stop")
 def stop_training():
-    """Stop the current training session"""
+    """Stop the current training session, killing the training process"""
     training_service.stop_training()
-    return {"message": "Stop signal sent"}
+    return {"message": "Training stopped"}
 
 @router.get("/status")
 def get_status():
     """Get current training status"""
     return training_service.get_status()
 
+@router.get("/events")
+async def stream_events(request: Request):
+    """
+    Server-sent events for the current run: started, one per epoch with its
+    metrics, and a final `finished` event whose status is completed, stopped
+    or error. Reconnecting clients resume after
+    the Last-Event-ID they saw.
+    """
+    last_id = int(request.headers.get("last-event-id") or 0)
+    
+    async def generate():
+        nonlocal last_id
+        while not await request.is_disconnected():
+            # Read the flag first so the final event is always sent before closing
+            finished = not training_service.is_training
+            for event in training_service.events_since(last_id):
+                last_id = event["id"]
+                yield f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            if finished:
+                break
+            await asyncio.sleep(training_service.poll_interval)
+    
+    return StreamingResponse(generate(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/models")
 def list_models():
     """List available custom models"""
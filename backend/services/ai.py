@@ -1,49 +1,351 @@
-from ultralytics import YOLO
-from rembg import remove
 from PIL import Image
-import io
 import numpy as np
-import cv2
 import os
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Union
+from services.detection_cache import detection_cache, content_hash
+from services.image_decode import DecodedImage, decode_for_inference
+from routers.settings import load_settings
+
+def detection_rows(image_id: int, detections: list, model_key: str) -> List[dict]:
+    """Detection table rows for one image, ready for a bulk INSERT"""
+    return [
+        {
+            "image_id": image_id,
+            "label": detection['label'],
+            "confidence": detection['confidence'],
+            "x1": detection['bbox'][0],
+            "y1": detection['bbox'][1],
+            "x2": detection['bbox'][2],
+            "y2": detection['bbox'][3],
+            "model_key": model_key
+        }
+        for detection in detections
+    ]
+
+class ModelRegistry:
+    """LRU of loaded models by model key, so switching back to a recently used model needs no load"""
+
+    def __init__(self, max_models: int = 2):
+        self.max_models = max(1, max_models)
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_key: str):
+        with self._lock:
+            model = self._models.get(model_key)
+            if model is not None:
+                self._models.move_to_end(model_key)
+            return model
+
+    def put(self, model_key: str, model):
+        with self._lock:
+            self._models[model_key] = model
+            self._models.move_to_end(model_key)
+            while len(self._models) > self.max_models:
+                # The active model is always the most recently used, so it is never evicted
+                self._models.popitem(last=False)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
 
 class AIService:
-    def __init__(self, model_path: str = "yolov8n.pt", confidence: float = 0.25):
-        # Load a pretrained YOLOv8n model
+    """
+    YOLO detection service. ultralytics (and torch) are only imported and the
+    weights only loaded on first use of `model`, or by `warm_up`, so importing
+    the API stays fast. Switching models loads and warms the new weights in
+    the background while the current model keeps serving, then swaps them in.
+    The "onnx" backend runs an ONNX export of the weights through onnxruntime
+    (see services/onnx_backend.py) instead of PyTorch.
+    """
+
+    def __init__(self, model_path: str = "yolov8n.pt", confidence: float = 0.25, batch_size: int = 8,
+                 max_models: int = 2, backend: str = "pytorch", quantize: bool = False,
+                 session_options: Optional[dict] = None, input_size: int = 640):
         self.model_path = model_path
         self.confidence = confidence
-        self.model = YOLO(model_path)
-
-    def reload_model(self, model_path: str = None, confidence: float = None):
-        """Reload model with new configuration"""
-        if model_path and model_path != self.model_path:
-            # Verify model exists if it's a file path
-            if not model_path.startswith("yolov8") and not os.path.exists(model_path):
-                raise FileNotFoundError(f"Model file not found: {model_path}")
-            self.model_path = model_path
-            self.model = YOLO(model_path)
-        
+        self.batch_size = batch_size
+        # Longest image side the model works at; encoded images are decoded no larger than needed
+        self.input_size = input_size
+        self.backend = backend
+        self.quantize = quantize
+        # onnxruntime threads and execution provider, applied when a model is next loaded
+        self.session_options = session_options or {}
+        # Checksumming the weights waits until the key is first needed, not import time
+        self._key = None
+        self._key_lock = threading.Lock()
+        self.state = "cold"  # cold, loading, ready, error
+        self.load_seconds = None
+        self.registry = ModelRegistry(max_models)
+        self.pending_model = None
+        self.last_load_error = None
+        self._model = None
+        self._generation = 0
+        self._load_lock = threading.Lock()
+        # Inference calls may arrive from several import workers at once; holding
+        # this lock also means a swap waits for in-flight inference to finish.
+        # Always taken after _load_lock, never before it
+        self._lock = threading.Lock()
+        self.last_batch_stats = {"images": 0, "seconds": 0.0, "images_per_sec": 0.0}
+
+    @property
+    def model_key(self) -> str:
+        if self._key is None:
+            with self._key_lock:
+                if self._key is None:
+                    self._key = self._model_key(self.model_path, self.backend, self.quantize)
+        return self._key
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self.state = "loading"
+                    try:
+                        model = self.registry.get(self.model_key)
+                        if model is None:
+                            model = self._load(self.model_path, self.backend, self.quantize)
+                    except Exception as e:
+                        self.state = "error"
+                        self.last_load_error = f"Failed to load {self.model_path}: {e}"
+                        raise
+                    self.registry.put(self.model_key, model)
+                    self._model = model
+                    self.last_load_error = None
+                    self.state = "ready"
+        return self._model
+
+    @property
+    def is_ready(self) -> bool:
+        return self.state == "ready"
+
+    def _load(self, model_path: str, backend: str, quantize: bool):
+        start = time.perf_counter()
+        if backend == "onnx":
+            from services.onnx_backend import load_onnx_detector
+            model = load_onnx_detector(model_path, quantize=quantize, **self.session_options)
+        else:
+            from ultralytics import YOLO
+            model = YOLO(model_path)
+        self.load_seconds = round(time.perf_counter() - start, 3)
+        return model
+
+    def _warm(self, model):
+        self._run(model, [np.zeros((64, 64, 3), dtype=np.uint8)], self.confidence)
+
+    def _run(self, model, images: list, confidence: float) -> List[list]:
+        """One inference call over `images`, returning a detection list per image"""
+        if hasattr(model, "detect"):
+            return model.detect(images, confidence)
+        results = model(images, conf=confidence, verbose=False)
+        return [self._parse_result(model, result) for result in results]
+
+    def warm_up(self):
+        """Load the weights and run one throwaway inference so the first request does not pay for either"""
+        try:
+            model = self.model
+            with self._lock:
+                self._warm(model)
+        except Exception as e:
+            if self.state != "error":
+                # Loaded, but the first inference failed
+                self.last_load_error = f"Warm-up of {self.model_path} failed: {e}"
+            print(f"Model warm-up failed: {e}")
+
+    def reload_model(self, model_path: str = None, confidence: float = None, batch_size: int = None,
+                     backend: str = None, quantize: bool = None, wait: bool = False) -> str:
+        """
+        Switch to new configuration. A model already in the registry is swapped
+        in immediately; otherwise it is loaded and warmed on a background
+        thread while the current model keeps serving (`wait` blocks until it
+        is in place). Returns "active", "swapped" or "loading".
+        """
         if confidence is not None:
             self.confidence = confidence
 
-    def detect_objects(self, image_bytes: bytes) -> list:
-        # Convert bytes to PIL Image
-        img = Image.open(io.BytesIO(image_bytes))
-        
-        # Run inference with confidence threshold
-        results = self.model(img, conf=self.confidence)
-        
+        if batch_size is not None:
+            self.batch_size = max(1, batch_size)
+
+        backend = backend or self.backend
+        quantize = self.quantize if quantize is None else quantize
+        model_path = model_path or self.model_path
+        # Verify model exists if it's a file path
+        if not model_path.startswith("yolov8") and not os.path.exists(model_path):
+            raise FileNotFoundError(f"Model file not found: {model_path}")
+        # Weights retrained in place keep their path but change checksum
+        model_key = self._model_key(model_path, backend, quantize)
+        with self._load_lock:
+            if model_key == self.model_key:
+                if self.pending_model:
+                    # Switching back while another model loads: that load must not swap in when it finishes
+                    self._generation += 1
+                    self.pending_model = None
+                return "active"
+
+            self._generation += 1
+            generation = self._generation
+            model = self.registry.get(model_key)
+            if model is not None or self._model is None:
+                # Either already warm, or nothing is loaded yet and the new model can load lazily
+                self.pending_model = None
+                self._swap(model_path, backend, quantize, model_key, model, generation)
+                return "swapped"
+            self.pending_model = model_path
+
+        loader = threading.Thread(
+            target=self._load_in_background,
+            args=(model_path, backend, quantize, model_key, generation),
+            name="model-loader",
+            daemon=True
+        )
+        loader.start()
+        if wait:
+            loader.join()
+            if self.last_load_error:
+                raise Exception(self.last_load_error)
+        return "loading"
+
+    def _load_in_background(self, model_path: str, backend: str, quantize: bool, model_key: str, generation: int):
+        try:
+            model = self._load(model_path, backend, quantize)
+            # The new model is not shared yet, so it warms up without blocking inference
+            self._warm(model)
+            self.registry.put(model_key, model)
+            self.last_load_error = None
+            self._swap(model_path, backend, quantize, model_key, model, generation)
+        except Exception as e:
+            self.last_load_error = f"Failed to load {model_path}: {e}"
+            print(self.last_load_error)
+        finally:
+            if generation == self._generation:
+                self.pending_model = None
+
+    def _swap(self, model_path: str, backend: str, quantize: bool, model_key: str, model, generation: int):
+        with self._lock:
+            # A newer reload request wins over a slower earlier one
+            if generation != self._generation:
+                return
+            self.model_path = model_path
+            self.backend = backend
+            self.quantize = quantize
+            self._key = model_key
+            self._model = model
+            self.state = "ready" if model is not None else "cold"
+
+    def _model_key(self, model_path: str, backend: str = "pytorch", quantize: bool = False) -> str:
+        """Identifies the loaded weights and backend; cached detections are only reused for the same key"""
+        if backend == "pytorch":
+            suffix = ""
+        else:
+            suffix = f":{backend}-int8" if quantize else f":{backend}"
+        if not os.path.exists(model_path):
+            return f"{model_path}:stock{suffix}"
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(model_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+        return f"{model_path}:{hasher.hexdigest()}{suffix}"
+
+    def _parse_result(self, model, result) -> list:
         detections = []
-        for result in results:
-            boxes = result.boxes
-            for box in boxes:
-                detections.append({
-                    "label": self.model.names[int(box.cls)],
-                    "confidence": float(box.conf),
-                    "bbox": box.xyxy.tolist()[0]
-                })
+        for box in result.boxes:
+            detections.append({
+                "label": model.names[int(box.cls)],
+                "confidence": float(box.conf),
+                "bbox": box.xyxy.tolist()[0]
+            })
         return detections
 
+    def detect_objects(self, image_bytes: bytes) -> list:
+        return self.detect_objects_batch([image_bytes], batch_size=1)[0]
+
+    def detect_objects_batch(self, images: List[Union[bytes, DecodedImage, Image.Image, np.ndarray]],
+                             batch_size: int = None,
+                             content_hashes: Optional[List[Optional[str]]] = None) -> List[list]:
+        """
+        Run detection over many images in mini-batches.
+        Accepts encoded bytes, DecodedImages, PIL images or BGR numpy arrays.
+        Bytes are decoded with `decode_for_inference`, and boxes found on a
+        DecodedImage are mapped back to its original pixel coordinates.
+        Images with a known content hash (computed here for bytes, or passed
+        in `content_hashes`) are served from the detection cache when possible.
+        Returns one detection list per input image, in input order.
+        """
+        batch_size = max(1, batch_size or self.batch_size)
+        if content_hashes is None:
+            content_hashes = [
+                content_hash(img) if isinstance(img, (bytes, bytearray)) else None
+                for img in images
+            ]
+        model_key, confidence = self.model_key, self.confidence
+        cached = detection_cache.get_many(content_hashes, model_key, confidence)
+
+        all_detections = [cached.get(image_hash) if image_hash else None for image_hash in content_hashes]
+        misses = [index for index, detections in enumerate(all_detections) if detections is None]
+        start = time.perf_counter()
+        decoded = [
+            decode_for_inference(images[index], self.input_size)
+            if isinstance(images[index], (bytes, bytearray)) else images[index]
+            for index in misses
+        ]
+        pil_images = [image.image if isinstance(image, DecodedImage) else image for image in decoded]
+
+        fresh = {}
+        for i in range(0, len(pil_images), batch_size):
+            chunk = pil_images[i:i + batch_size]
+            while True:
+                # Load before taking the inference lock: reload_model holds the load lock while it swaps
+                model = self.model
+                with self._lock:
+                    if self._model is not model:
+                        # Swapped out while loading, run on the new model instead
+                        continue
+                    model_key, confidence = self.model_key, self.confidence
+                    results = self._run(model, chunk, confidence)
+                break
+            for index, image, detections in zip(misses[i:i + batch_size], decoded[i:i + batch_size], results):
+                if isinstance(image, DecodedImage):
+                    for detection in detections:
+                        detection["bbox"] = image.scale_bbox(detection["bbox"])
+                all_detections[index] = detections
+                if content_hashes[index]:
+                    fresh[content_hashes[index]] = detections
+        elapsed = time.perf_counter() - start
+        detection_cache.put_many(fresh, model_key, confidence)
+
+        self.last_batch_stats = {
+            "images": len(images),
+            "cached": len(images) - len(misses),
+            "seconds": elapsed,
+            "images_per_sec": round(len(images) / elapsed, 2) if elapsed > 0 else 0.0
+        }
+        return all_detections
+
     def remove_background(self, image_bytes: bytes) -> bytes:
+        from rembg import remove
         return remove(image_bytes)
 
-ai_service = AIService()
+model_settings = load_settings().models
+
+ai_service = AIService(
+    model_path=(
+        model_settings.custom_model_path
+        if model_settings.use_custom_model and model_settings.custom_model_path
+        else model_settings.detection_model
+    ),
+    confidence=model_settings.detection_confidence,
+    batch_size=model_settings.inference_batch_size,
+    max_models=model_settings.loaded_models,
+    backend=model_settings.inference_backend,
+    quantize=model_settings.onnx_quantize_int8,
+    session_options={
+        "intra_op_threads": model_settings.onnx_intra_op_threads,
+        "inter_op_threads": model_settings.onnx_inter_op_threads,
+        "provider": model_settings.onnx_provider
+    }
+)
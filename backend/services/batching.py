@@ -0,0 +1,129 @@
+import asyncio
+from collections import Counter
+from typing import Callable, List
+from routers.settings import load_settings
+from services.ai import ai_service
+from services.executor import BoundedExecutor, ExecutorBusy, inference_executor
+
+class DetectionBatcher:
+    """
+    Micro-batches concurrent single-image detection requests. The first
+    request to arrive opens a batch, which runs once `max_batch` images are
+    waiting or `max_wait_ms` has passed, as one model call on the inference
+    executor; every caller then gets back its own detections. While a batch
+    runs, new requests queue up and form the next one.
+    """
+
+    def __init__(self, detect_batch: Callable[[List[bytes]], List[list]], executor: BoundedExecutor,
+                 max_batch: int = 8, max_wait_ms: float = 5.0, max_queue: int = 64):
+        self.detect_batch = detect_batch
+        self.executor = executor
+        self.max_batch = max(1, max_batch)
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.batch_sizes = Counter()
+        # Queue depth seen by each arriving request, itself included
+        self.queue_depths = Counter()
+        self.batches = 0
+        self.images = 0
+        self._waiting = []
+        self._arrived = None
+        self._worker = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiting)
+
+    async def detect(self, image_bytes: bytes) -> list:
+        if self._worker is None or self._worker.done():
+            # Created on first use so they belong to the running event loop
+            self._arrived = asyncio.Event()
+            self._worker = asyncio.create_task(self._collect())
+        if len(self._waiting) >= self.max_queue:
+            raise ExecutorBusy(self.executor.retry_after)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiting.append((image_bytes, future))
+        self.queue_depths[len(self._waiting)] += 1
+        self._arrived.set()
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._arrived.wait()
+            deadline = loop.time() + self.max_wait_ms / 1000
+            while len(self._waiting) < self.max_batch:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                self._arrived.clear()
+                try:
+                    await asyncio.wait_for(self._arrived.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+
+            batch, self._waiting = self._waiting[:self.max_batch], self._waiting[self.max_batch:]
+            if not self._waiting:
+                self._arrived.clear()
+            await self._dispatch(batch)
+
+    async def _dispatch(self, batch: list):
+        # Callers that disconnected while waiting are dropped
+        batch = [(image_bytes, future) for image_bytes, future in batch if not future.done()]
+        if not batch:
+            return
+        self.batches += 1
+        self.images += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        try:
+            results = await self.executor.run(self._detect, [image_bytes for image_bytes, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _detect(self, images: List[bytes]) -> list:
+        """Runs on the inference thread; one detection list, or the exception raised, per image"""
+        try:
+            return self.detect_batch(images, batch_size=len(images))
+        except Exception:
+            if len(images) == 1:
+                raise
+        # Retry one by one so a single unreadable upload only fails its own request
+        results = []
+        for image in images:
+            try:
+                results.append(self.detect_batch([image], batch_size=1)[0])
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def get_stats(self) -> dict:
+        return {
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self.queue_depth,
+            "batches": self.batches,
+            "images": self.images,
+            "mean_batch_size": round(self.images / self.batches, 2) if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "queue_depths": dict(sorted(self.queue_depths.items()))
+        }
+
+executor_settings = load_settings().executor
+
+detect_batcher = DetectionBatcher(
+    ai_service.detect_objects_batch,
+    inference_executor,
+    max_batch=executor_settings.detect_max_batch,
+    max_wait_ms=executor_settings.detect_max_wait_ms,
+    # Admission stays in step with the executor's own limit, counted in images
+    max_queue=executor_settings.max_pending_inference * executor_settings.detect_max_batch
+)
@@ -0,0 +1,65 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from services.disk_cache import DiskLRUCache
+from services.rclone import rclone_service, cloud_settings
+
+class CloudFileCache:
+    """
+    Local copies of remote files served by /cloud/serve, keyed by remote
+    path, size and modification time so a changed remote file is fetched
+    again. Least recently used files are evicted past `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str = "../data/cloud_cache", max_bytes: int = 1024 ** 3):
+        self.files = DiskLRUCache(cache_dir, max_bytes)
+        self._lock = threading.Lock()
+        self._in_flight = set()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cloud-cache")
+
+    def get(self, remote: str, path: str, size: int, mod_time: str) -> Optional[Path]:
+        """Path of the local copy, or None if the file is not cached yet"""
+        local_path = self._local_path(remote, path, size, mod_time)
+        return local_path if self.files.lookup(local_path) else None
+
+    def fetch(self, remote: str, path: str, size: int, mod_time: str) -> Path:
+        """Path of the local copy, downloading it first if it is not cached"""
+        local_path = self._local_path(remote, path, size, mod_time)
+        if self.files.lookup(local_path):
+            return local_path
+
+        tmp_path = local_path.with_name(f"{local_path.name}.{threading.get_ident()}.tmp")
+        rclone_service.copy_to_local(f"{self._remote(remote)}{path}", str(tmp_path))
+        os.replace(tmp_path, local_path)
+        self.files.add(local_path)
+        return local_path
+
+    def prefetch(self, remote: str, path: str, size: int, mod_time: str):
+        """Download the file into the cache in the background, once however often it is requested"""
+        local_path = self._local_path(remote, path, size, mod_time)
+        with self._lock:
+            if local_path in self._in_flight:
+                return
+            self._in_flight.add(local_path)
+        self._executor.submit(self._prefetch_one, local_path, remote, path, size, mod_time)
+
+    def _prefetch_one(self, local_path: Path, remote: str, path: str, size: int, mod_time: str):
+        try:
+            self.fetch(remote, path, size, mod_time)
+        except Exception as e:
+            print(f"Caching {remote}{path} failed: {e}")
+        finally:
+            with self._lock:
+                self._in_flight.discard(local_path)
+
+    def _remote(self, remote: str) -> str:
+        return remote if remote.endswith(":") else f"{remote}:"
+
+    def _local_path(self, remote: str, path: str, size: int, mod_time: str) -> Path:
+        key = hashlib.blake2b(f"{self._remote(remote)}|{path}|{size}|{mod_time}".encode(), digest_size=16).hexdigest()
+        return self.files.path_for(key, Path(path).suffix.lower())
+
+cloud_file_cache = CloudFileCache(max_bytes=cloud_settings.serve_cache_max_mb * 1024 * 1024)
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable
+from sqlalchemy import bindparam, delete, func, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from database import engine, read_session
+from models import DetectionCacheEntry
+
+def content_hash(data: bytes) -> str:
+    """BLAKE2b digest used as Image.content_hash and as the cache key for image bytes"""
+    return hashlib.blake2b(data, digest_size=32).hexdigest()
+
+class DetectionCache:
+    """
+    Persistent cache of detection results keyed by (content hash, model key,
+    confidence). The model key embeds a checksum of the weights, so results
+    from other weights are never served. Least recently used rows are evicted
+    once the table grows past `max_entries`. Lookups only read; the time of
+    each hit is buffered and written with the next `put_many`, or on its own
+    once `touch_flush_size` hits or `touch_flush_seconds` have accumulated.
+    """
+
+    def __init__(self, max_entries: int = 50000, touch_flush_size: int = 1000, touch_flush_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.touch_flush_size = touch_flush_size
+        self.touch_flush_seconds = touch_flush_seconds
+        self._lock = threading.Lock()
+        self._count = None
+        self._touched = {}
+        self._last_touch_flush = time.monotonic()
+
+    def get_many(self, content_hashes: Iterable[str], model_key: str, confidence: float) -> Dict[str, list]:
+        content_hashes = list({content_hash for content_hash in content_hashes if content_hash})
+        if not content_hashes:
+            return {}
+        with read_session() as session:
+            rows = session.exec(
+                select(DetectionCacheEntry.content_hash, DetectionCacheEntry.detections).where(
+                    DetectionCacheEntry.model_key == model_key,
+                    DetectionCacheEntry.confidence == confidence,
+                    DetectionCacheEntry.content_hash.in_(content_hashes)
+                )
+            ).all()
+        if rows:
+            now = datetime.utcnow()
+            with self._lock:
+                for content_hash, _ in rows:
+                    self._touched[(content_hash, model_key, confidence)] = now
+                due = (len(self._touched) >= self.touch_flush_size
+                       or time.monotonic() - self._last_touch_flush >= self.touch_flush_seconds)
+            if due:
+                with Session(engine) as session:
+                    self._write_touched(session)
+                    session.commit()
+        return {content_hash: json.loads(detections) for content_hash, detections in rows}
+
+    def put_many(self, results: Dict[str, list], model_key: str, confidence: float):
+        results = {content_hash: detections for content_hash, detections in results.items() if content_hash}
+        if not results:
+            return
+        now = datetime.utcnow()
+        statement = sqlite_insert(DetectionCacheEntry)
+        statement = statement.on_conflict_do_update(
+            index_elements=["content_hash", "model_key", "confidence"],
+            set_={"detections": statement.excluded.detections, "last_used": statement.excluded.last_used}
+        )
+        with Session(engine) as session:
+            session.execute(statement, [
+                {
+                    "content_hash": content_hash,
+                    "model_key": model_key,
+                    "confidence": confidence,
+                    "detections": json.dumps(detections),
+                    "last_used": now
+                }
+                for content_hash, detections in results.items()
+            ])
+            # Same transaction, so eviction below sees up-to-date recency
+            self._write_touched(session)
+            session.commit()
+            self._evict(session, len(results))
+
+    def clear(self):
+        with Session(engine) as session:
+            session.execute(delete(DetectionCacheEntry))
+            session.commit()
+        with self._lock:
+            self._count = 0
+            self._touched = {}
+
+    def _write_touched(self, session: Session):
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_touch_flush = time.monotonic()
+        if not touched:
+            return
+        table = DetectionCacheEntry.__table__
+        # One executemany; rows evicted or cleared in the meantime simply match nothing
+        session.connection().execute(
+            update(table)
+            .where(
+                table.c.content_hash == bindparam("hit_hash"),
+                table.c.model_key == bindparam("hit_model_key"),
+                table.c.confidence == bindparam("hit_confidence")
+            )
+            .values(last_used=bindparam("hit_last_used")),
+            [
+                {"hit_hash": content_hash, "hit_model_key": model_key,
+                 "hit_confidence": confidence, "hit_last_used": last_used}
+                for (content_hash, model_key, confidence), last_used in touched.items()
+            ]
+        )
+
+    def _evict(self, session: Session, added: int):
+        with self._lock:
+            if self._count is None:
+                self._count = session.exec(select(func.count()).select_from(DetectionCacheEntry)).one()
+            else:
+                self._count += added
+            # Trim in steps of 10% so eviction does not run on every insert
+            if self._count <= self.max_entries * 1.1:
+                return
+            excess = self._count - self.max_entries
+            oldest = select(DetectionCacheEntry.last_used).order_by(DetectionCacheEntry.last_used).offset(excess).limit(1)
+            session.execute(delete(DetectionCacheEntry).where(DetectionCacheEntry.last_used < oldest.scalar_subquery()))
+            session.commit()
+            self._count = session.exec(select(func.count()).select_from(DetectionCacheEntry)).one()
+
+detection_cache = DetectionCache()
@@ -0,0 +1,65 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+class DiskLRUCache:
+    """
+    A directory of cached files, spread over two-character subdirectories,
+    capped at `max_bytes` by evicting the least recently used file first.
+    Recency is kept in the files' modification times, so it survives a restart.
+    Callers write a file in place (through a ".tmp" name) and then `add` it.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def path_for(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{suffix}"
+
+    def lookup(self, path: Path) -> bool:
+        """Whether `path` is cached, marking it as most recently used"""
+        with self._lock:
+            hit = path in self._entries
+            if hit:
+                self._entries.move_to_end(path)
+        if not hit:
+            return False
+        try:
+            # Touch the file so recency survives a restart
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            with self._lock:
+                self._total_bytes -= self._entries.pop(path, 0)
+            return False
+
+    def add(self, path: Path):
+        """Record a newly written file, evicting older ones past `max_bytes`"""
+        size = path.stat().st_size
+        with self._lock:
+            if path in self._entries:
+                self._entries.move_to_end(path)
+                return
+            self._entries[path] = size
+            self._total_bytes += size
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_path, old_size = self._entries.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass
+
+    def _load_index(self):
+        files = [(path, path.stat()) for path in self.cache_dir.glob("*/*") if not path.name.endswith(".tmp")]
+        # Least recently used first, so eviction picks from the front
+        for path, stat in sorted(files, key=lambda entry: entry[1].st_mtime):
+            self._entries[path] = stat.st_size
+            self._total_bytes += stat.st_size
@@ -0,0 +1,72 @@
+import asyncio
+import functools
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import HTTPException
+from routers.settings import load_settings
+
+class ExecutorBusy(HTTPException):
+    """Raised instead of queuing when an executor already has its maximum of pending jobs"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Server is busy, try again shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class BoundedExecutor:
+    """Runs blocking work off the event loop, rejecting new work once `max_pending` jobs are in flight"""
+
+    def __init__(self, executor: Executor, max_pending: int, retry_after: int = 2):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def run(self, func, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            raise ExecutorBusy(self.retry_after)
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+        finally:
+            self._pending -= 1
+            self._slots.release()
+
+# Process pool entry points must be importable module-level functions.
+# They import their service inside the worker so the API's model state is never pickled.
+
+def image_operation(method: str, *args):
+    from services.image_processing import image_processing_service
+    return getattr(image_processing_service, method)(*args)
+
+def remove_background(image_bytes: bytes) -> bytes:
+    from rembg import remove
+    return remove(image_bytes)
+
+executor_settings = load_settings().executor
+
+# CPU-heavy PIL/OpenCV/rembg work runs in separate processes, out of reach of the GIL
+cpu_executor = BoundedExecutor(
+    ProcessPoolExecutor(
+        max_workers=executor_settings.process_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    ),
+    max_pending=executor_settings.max_pending_cpu,
+    retry_after=executor_settings.retry_after_seconds
+)
+
+# Model inference runs on one dedicated thread that owns the loaded model
+inference_executor = BoundedExecutor(
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference"),
+    max_pending=executor_settings.max_pending_inference,
+    retry_after=executor_settings.retry_after_seconds
+)
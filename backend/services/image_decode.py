@@ -0,0 +1,43 @@
+import io
+import math
+from dataclasses import dataclass
+from typing import List, Tuple
+from PIL import Image, ImageOps
+
+# MPO is the multi-picture JPEG many phones write; it decodes like a JPEG
+DRAFT_FORMATS = ("JPEG", "MPO")
+
+# EXIF orientations that rotate the image by 90 degrees, swapping width and height
+_ROTATED = (5, 6, 7, 8)
+
+@dataclass
+class DecodedImage:
+    """An upright RGB image decoded at reduced size, and the size of the full-resolution upright original"""
+    image: Image.Image
+    original_size: Tuple[int, int]
+
+    def scale_bbox(self, bbox: List[float]) -> List[float]:
+        """Map an [x1, y1, x2, y2] box on `image` to original pixel coordinates"""
+        scale_x = self.original_size[0] / self.image.width
+        scale_y = self.original_size[1] / self.image.height
+        return [bbox[0] * scale_x, bbox[1] * scale_y, bbox[2] * scale_x, bbox[3] * scale_y]
+
+def decode_for_inference(data: bytes, size: int = 640) -> DecodedImage:
+    """
+    Decode an image for a model that works at `size` pixels on the longest
+    side. JPEGs are decoded in draft mode, which lets libjpeg scale the DCT
+    by 1/2, 1/4 or 1/8 and skip most of the work for large photos; the
+    result is never smaller than `size`, the model does the final resize.
+    """
+    img = Image.open(io.BytesIO(data))
+    width, height = img.size
+    if img.format in DRAFT_FORMATS and max(width, height) > size:
+        longest = max(width, height)
+        img.draft("RGB", (math.ceil(width * size / longest), math.ceil(height * size / longest)))
+
+    if img.getexif().get(0x0112) in _ROTATED:
+        width, height = height, width
+    img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return DecodedImage(img, (width, height))
@@ -2,53 +2,108 @@ from PIL import Image, ImageEnhance, ImageFilter
 import cv2
 import numpy as np
 from io import BytesIO
+from typing import List, Tuple
+
+OUTPUT_FORMATS = {
+    "png": ("PNG", "image/png"),
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
 
 class ImageProcessingService:
+    """
+    Image operations work on a decoded PIL image, so they can be chained by
+    `run_pipeline` with one decode and one encode. The single-operation
+    methods below wrap each operation with its own decode/encode.
+    """
+
     def __init__(self):
-        pass
-    
+        self.operations = {
+            "enhance": self._enhance,
+            "crop": self._crop,
+            "smart_crop": self._smart_crop,
+            "auto_crop": self._auto_crop,
+            "resize": self._resize,
+        }
+
+    def decode(self, image_bytes: bytes) -> Image.Image:
+        img = Image.open(BytesIO(image_bytes))
+        img.load()
+        return img
+
+    def encode(self, img: Image.Image, output_format: str = "png", quality: int = 90) -> Tuple[bytes, str]:
+        pil_format, media_type = OUTPUT_FORMATS[output_format]
+        if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        output = BytesIO()
+        img.save(output, format=pil_format, quality=quality)
+        return output.getvalue(), media_type
+
+    def run_pipeline(self, image_bytes: bytes, operations: List[dict],
+                     output_format: str = "png", quality: int = 90) -> Tuple[bytes, str]:
+        """
+        Apply an ordered list of operations, e.g.
+        [{"op": "auto_crop"}, {"op": "resize", "max_width": 800}, {"op": "enhance"}],
+        decoding once at the start and encoding once at the end.
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format: {output_format}")
+        img = self.decode(image_bytes)
+        for operation in operations:
+            params = dict(operation)
+            name = params.pop("op")
+            if name not in self.operations:
+                raise ValueError(f"Unknown operation: {name}")
+            img = self.operations[name](img, **params)
+        return self.encode(img, output_format, quality)
+
     def enhance_image(self, image_bytes: bytes) -> bytes:
         """
         Enhance image quality (brightness, contrast, sharpness)
         """
-        img = Image.open(BytesIO(image_bytes))
-        
-        # Auto-enhance
-        enhancer = ImageEnhance.Contrast(img)
-        img = enhancer.enhance(1.2)
-        
-        enhancer = ImageEnhance.Brightness(img)
-        img = enhancer.enhance(1.1)
-        
-        enhancer = ImageEnhance.Sharpness(img)
-        img = enhancer.enhance(1.3)
-        
-        # Convert back to bytes
-        output = BytesIO()
-        img.save(output, format='PNG')
-        return output.getvalue()
+        return self.encode(self._enhance(self.decode(image_bytes)))[0]
     
     def crop_image(self, image_bytes: bytes, x: int, y: int, width: int, height: int) -> bytes:
         """
         Crop image to specified coordinates
         """
-        img = Image.open(BytesIO(image_bytes))
-        cropped = img.crop((x, y, x + width, y + height))
-        
-        output = BytesIO()
-        cropped.save(output, format='PNG')
-        return output.getvalue()
+        return self.encode(self._crop(self.decode(image_bytes), x, y, width, height))[0]
     
     def smart_crop(self, image_bytes: bytes) -> bytes:
         """
         Smart crop using edge detection to find the main subject
         """
-        # Convert to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        return self.encode(self._smart_crop(self.decode(image_bytes)))[0]
+    
+    def auto_crop(self, image_bytes: bytes) -> bytes:
+        """
+        Auto-crop to remove white/transparent borders
+        """
+        return self.encode(self._auto_crop(self.decode(image_bytes)))[0]
+    
+    def resize_image(self, image_bytes: bytes, max_width: int = 1920, max_height: int = 1080) -> bytes:
+        """
+        Resize image while maintaining aspect ratio
+        """
+        return self.encode(self._resize(self.decode(image_bytes), max_width, max_height))[0]
+
+    def _enhance(self, img: Image.Image) -> Image.Image:
+        # Auto-enhance
+        enhancer = ImageEnhance.Contrast(img)
+        img = enhancer.enhance(1.2)
         
-        # Convert to grayscale
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        enhancer = ImageEnhance.Brightness(img)
+        img = enhancer.enhance(1.1)
+        
+        enhancer = ImageEnhance.Sharpness(img)
+        return enhancer.enhance(1.3)
+
+    def _crop(self, img: Image.Image, x: int, y: int, width: int, height: int) -> Image.Image:
+        return img.crop((x, y, x + width, y + height))
+
+    def _smart_crop(self, img: Image.Image) -> Image.Image:
+        # Edge detection only needs the grayscale plane, which PIL derives with the same weights as cv2
+        gray = np.asarray(img.convert("L"))
         
         # Apply edge detection
         edges = cv2.Canny(gray, 50, 150)
@@ -56,36 +111,26 @@ class ImageProcessingService:
         # Find contours
         contours, _ = cv2.findContours(edges, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
         
-        if contours:
-            # Find the largest contour
-            largest_contour = max(contours, key=cv2.contourArea)
-            x, y, w, h = cv2.boundingRect(largest_contour)
-            
-            # Add padding
-            padding = 20
-            x = max(0, x - padding)
-            y = max(0, y - padding)
-            w = min(img.shape[1] - x, w + 2 * padding)
-            h = min(img.shape[0] - y, h + 2 * padding)
-            
-            # Crop
-            cropped = img[y:y+h, x:x+w]
-        else:
+        if not contours:
             # If no contours found, return original
-            cropped = img
+            return img
         
-        # Convert back to bytes
-        _, buffer = cv2.imencode('.png', cropped)
-        return buffer.tobytes()
-    
-    def auto_crop(self, image_bytes: bytes) -> bytes:
-        """
-        Auto-crop to remove white/transparent borders
-        """
-        img = Image.open(BytesIO(image_bytes))
+        # Find the largest contour
+        largest_contour = max(contours, key=cv2.contourArea)
+        x, y, w, h = cv2.boundingRect(largest_contour)
         
+        # Add padding
+        padding = 20
+        x = max(0, x - padding)
+        y = max(0, y - padding)
+        w = min(img.width - x, w + 2 * padding)
+        h = min(img.height - y, h + 2 * padding)
+        
+        return img.crop((x, y, x + w, y + h))
+
+    def _auto_crop(self, img: Image.Image) -> Image.Image:
         # Convert to numpy array
-        img_array = np.array(img)
+        img_array = np.asarray(img)
         
         # Find non-white pixels
         if len(img_array.shape) == 3:
@@ -97,30 +142,16 @@ class ImageProcessingService:
         
         # Find bounding box
         coords = np.argwhere(mask)
-        if len(coords) > 0:
-            y0, x0 = coords.min(axis=0)
-            y1, x1 = coords.max(axis=0) + 1
-            
-            # Crop
-            cropped = img.crop((x0, y0, x1, y1))
-        else:
-            cropped = img
+        if len(coords) == 0:
+            return img
         
-        output = BytesIO()
-        cropped.save(output, format='PNG')
-        return output.getvalue()
-    
-    def resize_image(self, image_bytes: bytes, max_width: int = 1920, max_height: int = 1080) -> bytes:
-        """
-        Resize image while maintaining aspect ratio
-        """
-        img = Image.open(BytesIO(image_bytes))
-        
-        # Calculate new size
+        y0, x0 = coords.min(axis=0)
+        y1, x1 = coords.max(axis=0) + 1
+        return img.crop((int(x0), int(y0), int(x1), int(y1)))
+
+    def _resize(self, img: Image.Image, max_width: int = 1920, max_height: int = 1080) -> Image.Image:
+        # thumbnail() resizes in place, keeping the aspect ratio
         img.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
-        
-        output = BytesIO()
-        img.save(output, format='PNG')
-        return output.getvalue()
+        return img
 
 image_processing_service = ImageProcessingService()
@@ -0,0 +1,605 @@
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+from sqlalchemy import event, insert, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from database import engine, read_session
+from models import Item, Image, Category, Tag, ItemTagLink, Log, ImportJob, ImportJobFile, Detection
+from services.ai import ai_service, detection_rows
+from services.import_pipeline import ImportPipeline, PipelineEntry
+from services.stats import stats_service
+from services.thumbnails import thumbnail_service
+from services.phash import phash_index, dhash_file
+from services.scanner import scanner_service, IMAGE_EXTENSIONS
+from services.rclone import rclone_service
+
+# Ensure log directory exists
+LOG_DIR = Path("../data/logs")
+LOG_DIR.mkdir(parents=True, exist_ok=True)
+
+# Cloud imports download here before entering the pipeline
+STAGING_DIR = Path("../data/staging")
+
+def log_import_error(file_path: str, error: Exception):
+    with open("backend_errors.log", "a") as err_log:
+        err_log.write(f"Error importing {file_path}: {error}\n")
+    print(f"Error importing {file_path}: {error}")
+
+class BulkImportWriter:
+    """
+    Buffers finished files and writes them in one transaction per chunk.
+    Tag ids come from an in-memory name->id cache warmed when the writer is
+    created, so the number of commits no longer depends on detections.
+    Files whose content hash is already stored are resolved to the existing
+    item instead of creating a new one.
+    """
+
+    def __init__(self, session: Session, job: ImportJob, category: Optional[Category], chunk_size: int = 64, max_delay: float = 2.0):
+        self.session = session
+        self.job = job
+        self.category_id = category.id if category else None
+        self.chunk_size = max(1, chunk_size)
+        self.max_delay = max_delay
+        self.tag_ids = {name: tag_id for tag_id, name in session.exec(select(Tag.id, Tag.name)).all()}
+        self._results = []
+        self._duplicates = []
+        self._failures = []
+        self._new_tags = 0
+        self._copied_paths = []
+        self._scanned = []
+        self._finished_paths = []
+        self._last_flush = time.perf_counter()
+
+    def add_result(self, job_file: ImportJobFile, entry: PipelineEntry):
+        if entry.duplicate:
+            entry.data = None
+            self._duplicates.append((job_file, entry))
+        else:
+            self._results.append((job_file, entry))
+        self._maybe_flush()
+
+    def add_failure(self, job_file: ImportJobFile, status: str, error: str):
+        self._failures.append((job_file, status, error))
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if (len(self._results) + len(self._duplicates) + len(self._failures) >= self.chunk_size
+                or time.perf_counter() - self._last_flush >= self.max_delay):
+            self.flush()
+
+    def flush(self, final: bool = False):
+        results, failures = self._results, self._failures
+        self._results, self._failures = [], []
+        self._last_flush = time.perf_counter()
+        if not results and not failures and not self._duplicates:
+            return
+
+        self._new_tags = 0
+        self._new_images = []
+        self._copied_paths = []
+        self._scanned = []
+        try:
+            # Another job may have stored the same content since these files were read
+            existing = self._existing_items(entry.content_hash for _, entry in results)
+            for job_file, entry in results:
+                if entry.content_hash in existing:
+                    entry.duplicate = True
+                    self._duplicates.append((job_file, entry))
+            results = [(job_file, entry) for job_file, entry in results if not entry.duplicate]
+
+            imported = self._write_results(results, failures)
+            linked = self._resolve_duplicates(final)
+            # Files handled here are skipped by the next incremental scan unless they change
+            scanner_service.record(self.session, self._scanned)
+        except Exception as e:
+            # Nothing from this chunk was committed; record every file in it as failed
+            self.session.rollback()
+            already_failed = {id(job_file) for job_file, _, _ in failures}
+            for job_file, _ in results:
+                if id(job_file) not in already_failed:
+                    log_import_error(job_file.path, e)
+                    failures.append((job_file, "failed", str(e)))
+            imported, linked = [], []
+
+        for job_file, status, error in failures:
+            self._mark_file(job_file, status, error=error)
+        self.session.add(self.job)
+        self.session.commit()
+        if imported:
+            stats_service.record_items_added(self.category_id, len(imported), len(imported), self._new_tags)
+            thumbnail_service.pregenerate(self._copied_paths)
+            phash_index.add_many(self._new_images)
+
+        if self.job.delete_original and (imported or linked):
+            self._delete_originals(imported + linked)
+        if self.job.source:
+            self._discard_staged()
+
+    def _existing_items(self, content_hashes) -> dict:
+        content_hashes = [content_hash for content_hash in content_hashes if content_hash]
+        if not content_hashes:
+            return {}
+        rows = self.session.exec(
+            select(Image.content_hash, Image.item_id)
+            .where(Image.content_hash.in_(content_hashes), Image.item_id.is_not(None))
+        ).all()
+        return dict(rows)
+
+    def _resolve_duplicates(self, final: bool) -> list:
+        """Point duplicates at the item holding their content; returns originals that may be deleted"""
+        existing = self._existing_items(entry.content_hash for _, entry in self._duplicates)
+        pending, linked = [], []
+        for job_file, entry in self._duplicates:
+            item_id = existing.get(entry.content_hash)
+            if item_id is None and not final:
+                # The first copy of this content is still in flight in this job
+                pending.append((job_file, entry))
+            elif item_id is None:
+                self._mark_file(job_file, "skipped", error="Duplicate of a file that failed to import")
+            elif self.job.on_duplicate == "link":
+                self._mark_file(job_file, "linked", item_id=item_id, error=f"Linked to existing item {item_id}")
+                self.session.add(Log(
+                    action="import_duplicate",
+                    details=f"Linked {job_file.path} to existing item {item_id}"
+                ))
+                linked.append(job_file.path)
+            else:
+                self._mark_file(job_file, "skipped", item_id=item_id, error=f"Duplicate of item {item_id}")
+            if item_id is not None:
+                self._record_scanned(entry)
+            entry.data = None
+        self._duplicates = pending
+        return linked
+
+    def _write_results(self, results: list, failures: list) -> list:
+        session = self.session
+        if not results:
+            return []
+        self._ensure_tags({d['label'] for _, entry in results for d in entry.detections})
+
+        # Create items; flushing assigns their ids in one multi-row INSERT
+        items = []
+        for job_file, entry in results:
+            detections = entry.detections
+            if detections:
+                item_name = f"{detections[0]['label']} - {Path(job_file.path).stem}"
+            else:
+                item_name = Path(job_file.path).stem
+            items.append(Item(
+                name=item_name,
+                description=f"Detected objects: {', '.join([d['label'] for d in detections])}",
+                category_id=self.category_id
+            ))
+        session.add_all(items)
+        session.flush()
+
+        # Store the bytes read by the pipeline in the log directory, now that item ids are known
+        images, image_detections, links, logs, imported = [], [], [], [], []
+        for (job_file, entry), item in zip(results, items):
+            detections = entry.detections
+            filename = f"{item.id}_{Path(job_file.path).name}"
+            dest_path = LOG_DIR / filename
+            try:
+                with open(dest_path, 'wb') as f:
+                    f.write(entry.data)
+                shutil.copystat(job_file.path, dest_path)
+            except Exception as e:
+                log_import_error(job_file.path, e)
+                session.delete(item)
+                failures.append((job_file, "failed", str(e)))
+                continue
+            finally:
+                entry.data = None
+
+            images.append({
+                "filename": filename,
+                "path": str(dest_path),
+                "item_id": item.id,
+                "is_primary": True,
+                "content_hash": entry.content_hash,
+                "phash": entry.phash
+            })
+            image_detections.append((detections, entry.model_key or ai_service.model_key))
+            links.extend(
+                {"item_id": item.id, "tag_id": self.tag_ids[label]}
+                for label in set(d['label'] for d in detections)
+            )
+            logs.append({
+                "action": "import",
+                "details": f"Imported {filename} with {len(detections)} detections",
+                "timestamp": datetime.utcnow()
+            })
+            self._mark_file(job_file, "done", item_id=item.id, detections=len(detections))
+            self._record_scanned(entry)
+            imported.append(job_file.path)
+            self._copied_paths.append(str(dest_path))
+
+        if images:
+            # Images left without an item by older deletes still hold their hash, which is unique
+            session.execute(
+                update(Image)
+                .where(Image.item_id.is_(None), Image.content_hash.in_([image["content_hash"] for image in images]))
+                .values(content_hash=None)
+            )
+            self._new_images = session.execute(
+                insert(Image).returning(Image.id, Image.phash, sort_by_parameter_order=True), images
+            ).all()
+            rows = [
+                row
+                for (image_id, _), (detections, model_key) in zip(self._new_images, image_detections)
+                for row in detection_rows(image_id, detections, model_key)
+            ]
+            if rows:
+                session.execute(insert(Detection), rows)
+        if links:
+            session.execute(insert(ItemTagLink), links)
+        if logs:
+            session.execute(insert(Log), logs)
+        return imported
+
+    def _record_scanned(self, entry: PipelineEntry):
+        if entry.size is not None and not self.job.source:
+            self._scanned.append((entry.path, entry.size, entry.mtime_ns, entry.content_hash))
+
+    def _ensure_tags(self, names: set):
+        missing = [name for name in names if name not in self.tag_ids]
+        if not missing:
+            return
+        # Another job may be creating the same tags concurrently
+        self.session.execute(
+            sqlite_insert(Tag).on_conflict_do_nothing(index_elements=["name"]),
+            [{"name": name} for name in missing]
+        )
+        known = len(self.tag_ids)
+        for tag_id, name in self.session.exec(select(Tag.id, Tag.name).where(Tag.name.in_(missing))).all():
+            self.tag_ids[name] = tag_id
+        self._new_tags += len(self.tag_ids) - known
+
+    def _delete_originals(self, paths: List[str]):
+        logs = []
+        for path in paths:
+            try:
+                os.remove(path)
+                logs.append({
+                    "action": "delete_original",
+                    "details": f"Deleted original file: {path}",
+                    "timestamp": datetime.utcnow()
+                })
+            except Exception as e:
+                log_import_error(path, e)
+        if logs:
+            self.session.execute(insert(Log), logs)
+            self.session.commit()
+
+    def _discard_staged(self):
+        """Staged copies of committed files are no longer needed; a resumed job only re-fetches pending ones"""
+        for path in self._finished_paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._finished_paths = []
+
+    def _mark_file(self, job_file: ImportJobFile, status: str,
+                   item_id: Optional[int] = None, detections: int = 0, error: Optional[str] = None):
+        if self.job.source:
+            # Only staged copies are tracked; local imports never discard their files
+            self._finished_paths.append(job_file.path)
+        job_file.status = status
+        job_file.item_id = item_id
+        job_file.detections = detections
+        job_file.error = error
+        self.session.add(job_file)
+        self.job.processed += 1
+        if status == "done":
+            self.job.imported += 1
+        elif status == "failed":
+            self.job.failed += 1
+
+class ImportJobService:
+    def __init__(self, max_workers: int = 2, readers: int = 4, decoders: int = None,
+                 queue_size: int = 16, chunk_size: int = 64):
+        self.readers = readers
+        self.chunk_size = chunk_size
+        self.decoders = decoders
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-job")
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def create_job(self, files: List[str], category_name: Optional[str] = None,
+                   delete_original: bool = False, batch_size: Optional[int] = None,
+                   on_duplicate: str = "skip") -> int:
+        """Persist a job and its per-file rows, then queue it on the worker pool"""
+        with Session(engine) as session:
+            job = ImportJob(
+                category_name=category_name,
+                delete_original=delete_original,
+                batch_size=batch_size,
+                on_duplicate=on_duplicate,
+                total=len(files)
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            job_id = job.id
+
+            session.add_all(
+                ImportJobFile(job_id=job_id, position=position, path=path)
+                for position, path in enumerate(files)
+            )
+            session.commit()
+
+        self.submit(job_id)
+        return job_id
+
+    def create_cloud_job(self, remote: str, path: str = "", category_name: Optional[str] = None,
+                         batch_size: Optional[int] = None, on_duplicate: str = "skip",
+                         transfers: Optional[int] = None) -> Tuple[int, int]:
+        """
+        Queue an import of every image below a remote folder. Files are
+        downloaded into a per-job staging directory by the pipeline readers,
+        `transfers` at a time, and removed once their chunk is committed.
+        Returns (job_id, number of files).
+        """
+        remote = remote if remote.endswith(":") else f"{remote}:"
+        path = path.strip("/")
+        entries = [
+            entry for entry in rclone_service.list_tree(remote, path)
+            if Path(entry["Name"]).suffix.lower() in IMAGE_EXTENSIONS
+        ]
+        with Session(engine) as session:
+            job = ImportJob(
+                category_name=category_name,
+                batch_size=batch_size,
+                on_duplicate=on_duplicate,
+                source=f"{remote}{path}",
+                transfers=transfers,
+                total=len(entries)
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            job_id = job.id
+
+            staging = STAGING_DIR / f"job_{job_id}"
+            session.add_all(
+                ImportJobFile(
+                    job_id=job_id,
+                    position=position,
+                    # Listed paths are relative to the folder; keep its layout so names cannot collide
+                    path=str(staging / entry["Path"]),
+                    source=f"{remote}{path}/{entry['Path']}" if path else f"{remote}{entry['Path']}"
+                )
+                for position, entry in enumerate(entries)
+            )
+            session.commit()
+
+        self.submit(job_id)
+        return job_id, len(entries)
+
+    def submit(self, job_id: int):
+        with self._lock:
+            if job_id in self._active:
+                return
+            self._active.add(job_id)
+        self.executor.submit(self._run_job, job_id)
+
+    def resume_incomplete_jobs(self) -> List[int]:
+        """Re-queue jobs interrupted by a crash or restart; they continue from their pending files"""
+        with Session(engine) as session:
+            job_ids = session.exec(
+                select(ImportJob.id).where(ImportJob.status.in_(["queued", "running"]))
+            ).all()
+        for job_id in job_ids:
+            self.submit(job_id)
+        return list(job_ids)
+
+    def backfill_hashes(self) -> int:
+        """Hash images stored before content/perceptual hashes existed, so new imports and searches can match them"""
+        with Session(engine) as session:
+            known = set(session.exec(select(Image.content_hash).where(Image.content_hash.is_not(None))).all())
+            images = session.exec(
+                select(Image).where((Image.content_hash.is_(None)) | (Image.phash.is_(None)))
+            ).all()
+            updated = 0
+            for image in images:
+                path = LOG_DIR / image.filename
+                if not path.exists():
+                    continue
+                if image.phash is None:
+                    try:
+                        image.phash = dhash_file(str(path))
+                        session.add(image)
+                        updated += 1
+                    except Exception as e:
+                        print(f"Could not hash {path}: {e}")
+                if image.content_hash is not None:
+                    continue
+                hasher = hashlib.blake2b(digest_size=32)
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                        hasher.update(chunk)
+                content_hash = hasher.hexdigest()
+                # Existing duplicates keep no hash; the unique index allows only one image per content
+                if content_hash in known:
+                    continue
+                known.add(content_hash)
+                image.content_hash = content_hash
+                session.add(image)
+                updated += 1
+            session.commit()
+        phash_index.invalidate()
+        return updated
+
+    def get_job(self, job_id: int, include_files: bool = False) -> Optional[dict]:
+        with read_session() as session:
+            job = session.get(ImportJob, job_id)
+            if not job:
+                return None
+            result = self._job_summary(job)
+            if include_files:
+                job_files = session.exec(
+                    select(ImportJobFile)
+                    .where(ImportJobFile.job_id == job_id)
+                    .order_by(ImportJobFile.position)
+                ).all()
+                result["files"] = [
+                    {
+                        "path": job_file.path,
+                        "status": job_file.status,
+                        "item_id": job_file.item_id,
+                        "detections": job_file.detections,
+                        "error": job_file.error
+                    }
+                    for job_file in job_files
+                ]
+            return result
+
+    def list_jobs(self, limit: int = 20) -> List[dict]:
+        with read_session() as session:
+            jobs = session.exec(select(ImportJob).order_by(ImportJob.id.desc()).limit(limit)).all()
+            return [self._job_summary(job) for job in jobs]
+
+    def _job_summary(self, job: ImportJob) -> dict:
+        return {
+            "id": job.id,
+            "status": job.status,
+            "category_name": job.category_name,
+            "source": job.source,
+            "total": job.total,
+            "processed": job.processed,
+            "imported": job.imported,
+            "failed": job.failed,
+            "progress": round(job.processed / job.total * 100, 1) if job.total else 100.0,
+            "images_per_sec": round(job.processed / job.elapsed_seconds, 2) if job.elapsed_seconds > 0 else 0.0,
+            "detect_images_per_sec": round(job.imported / job.detect_seconds, 2) if job.detect_seconds > 0 else 0.0,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at
+        }
+
+    def _run_job(self, job_id: int):
+        try:
+            self._process_job(job_id)
+        except Exception as e:
+            print(f"Import job {job_id} failed: {e}")
+            with Session(engine) as session:
+                job = session.get(ImportJob, job_id)
+                if job:
+                    job.status = "failed"
+                    job.error = str(e)
+                    job.finished_at = datetime.utcnow()
+                    session.add(job)
+                    session.commit()
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _process_job(self, job_id: int):
+        with Session(engine) as session:
+            job = session.get(ImportJob, job_id)
+            if not job:
+                return
+            job.status = "running"
+            job.started_at = job.started_at or datetime.utcnow()
+            session.add(job)
+            session.commit()
+
+            # Get or create category
+            category = None
+            if job.category_name:
+                category = session.exec(select(Category).where(Category.name == job.category_name)).first()
+                if not category:
+                    category = Category(name=job.category_name)
+                    session.add(category)
+                    session.commit()
+                    session.refresh(category)
+                    stats_service.record_category_created(category)
+
+            # Only files not yet committed are picked up, so a restarted job resumes where it stopped
+            pending = session.exec(
+                select(ImportJobFile)
+                .where(ImportJobFile.job_id == job_id, ImportJobFile.status == "pending")
+                .order_by(ImportJobFile.position)
+            ).all()
+            job_files = {job_file.id: job_file for job_file in pending}
+
+            # Content already stored, plus content claimed by earlier files of this job
+            known_hashes = set(session.exec(
+                select(Image.content_hash).where(Image.content_hash.is_not(None), Image.item_id.is_not(None))
+            ).all())
+            known_lock = threading.Lock()
+
+            def is_duplicate(content_hash: str) -> bool:
+                with known_lock:
+                    if content_hash in known_hashes:
+                        return True
+                    known_hashes.add(content_hash)
+                    return False
+
+            fetch = None
+            if job.source:
+                sources = {job_file.id: job_file.source for job_file in pending}
+
+                def fetch(entry: PipelineEntry):
+                    rclone_service.copy_to_local(sources[entry.key], entry.path)
+
+            pipeline = ImportPipeline(
+                batch_size=job.batch_size or ai_service.batch_size,
+                # Each cloud reader holds one transfer in flight
+                readers=(job.transfers or self.readers) if job.source else self.readers,
+                decoders=self.decoders,
+                queue_size=self.queue_size,
+                is_duplicate=is_duplicate,
+                fetch=fetch
+            )
+            writer = BulkImportWriter(session, job, category, chunk_size=self.chunk_size)
+            base_detect_seconds = job.detect_seconds
+            checkpoint = time.perf_counter()
+
+            def on_result(entry: PipelineEntry):
+                writer.add_result(job_files[entry.key], entry)
+
+            def on_error(entry: PipelineEntry):
+                if isinstance(entry.error, FileNotFoundError):
+                    writer.add_failure(job_files[entry.key], "skipped", str(entry.error))
+                else:
+                    log_import_error(entry.path, entry.error)
+                    writer.add_failure(job_files[entry.key], "failed", str(entry.error))
+
+            @event.listens_for(session, "before_commit")
+            def record_timing(_session):
+                nonlocal checkpoint
+                now = time.perf_counter()
+                job.elapsed_seconds += now - checkpoint
+                job.detect_seconds = base_detect_seconds + pipeline.detect_seconds
+                checkpoint = now
+
+            pipeline.run(
+                ((job_file.id, job_file.path) for job_file in pending),
+                on_result=on_result,
+                on_error=on_error
+            )
+            writer.flush(final=True)
+
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            if job.source:
+                shutil.rmtree(STAGING_DIR / f"job_{job_id}", ignore_errors=True)
+            session.add(job)
+            session.add(Log(
+                action="import_job",
+                details=f"Import job {job_id} finished: {job.imported} imported, {job.failed} failed of {job.total}"
+            ))
+            session.commit()
+
+import_job_service = ImportJobService()
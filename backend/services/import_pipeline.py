@@ -0,0 +1,212 @@
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Iterable, Optional, Tuple
+import numpy as np
+from services.ai import ai_service
+from services.image_decode import DecodedImage, decode_for_inference
+from services.phash import dhash
+
+_DONE = object()
+
+@dataclass
+class PipelineEntry:
+    key: Any
+    path: str
+    data: Optional[bytes] = None
+    image: Optional[DecodedImage] = None
+    detections: Optional[list] = None
+    model_key: Optional[str] = None
+    content_hash: Optional[str] = None
+    size: Optional[int] = None
+    mtime_ns: Optional[int] = None
+    phash: Optional[str] = None
+    duplicate: bool = False
+    error: Optional[Exception] = None
+
+    @property
+    def passthrough(self) -> bool:
+        """Entries that failed or duplicate an existing image skip the remaining stages"""
+        return self.error is not None or self.duplicate
+
+class ImportPipeline:
+    """
+    Streaming import pipeline built from bounded queues:
+    reader threads -> decoder threads -> one batching inference stage -> writer.
+    The writer runs in the calling thread, so all database work stays on one
+    session. Queue sizes cap how many files are held in memory at once.
+    Readers hash the bytes as they read them; files that `is_duplicate`
+    reports as already known skip decoding and inference. An optional
+    `fetch` hook stages each file (e.g. from a cloud remote) before it is read.
+    """
+
+    def __init__(self, batch_size: int = 8, readers: int = 4, decoders: int = None,
+                 queue_size: int = 16, batch_wait: float = 0.05,
+                 is_duplicate: Callable[[str], bool] = None,
+                 fetch: Callable[[PipelineEntry], None] = None):
+        self.batch_size = max(1, batch_size)
+        self.readers = max(1, readers)
+        self.decoders = max(1, decoders or (os.cpu_count() or 2) // 2)
+        self.queue_size = max(self.batch_size, queue_size)
+        self.batch_wait = batch_wait
+        self.is_duplicate = is_duplicate
+        self.fetch = fetch
+        self.detect_seconds = 0.0
+        self.detected = 0
+        self._stop = threading.Event()
+
+    def run(self, files: Iterable[Tuple[Any, str]],
+            on_result: Callable[[PipelineEntry], None],
+            on_error: Callable[[PipelineEntry], None]):
+        """Process (key, path) pairs, calling on_result/on_error from this thread as files finish"""
+        self._stop.clear()
+        path_queue = Queue()
+        read_queue = Queue(maxsize=self.queue_size)
+        decoded_queue = Queue(maxsize=self.queue_size)
+        result_queue = Queue(maxsize=self.queue_size)
+
+        for key, path in files:
+            path_queue.put(PipelineEntry(key=key, path=path))
+        for _ in range(self.readers):
+            path_queue.put(_DONE)
+
+        self._start_stage("import-read", self.readers, self._read, path_queue, read_queue, self.decoders)
+        self._start_stage("import-decode", self.decoders, self._decode, read_queue, decoded_queue, 1)
+        threading.Thread(
+            target=self._infer, args=(decoded_queue, result_queue),
+            name="import-infer", daemon=True
+        ).start()
+
+        try:
+            while True:
+                entry = result_queue.get()
+                if entry is _DONE:
+                    break
+                if entry.error is not None:
+                    on_error(entry)
+                else:
+                    on_result(entry)
+        finally:
+            # Unblock the upstream stages if the writer bailed out early
+            self._stop.set()
+
+    def _get(self, queue: Queue):
+        while not self._stop.is_set():
+            try:
+                return queue.get(timeout=0.1)
+            except Empty:
+                continue
+        return _DONE
+
+    def _put(self, queue: Queue, entry):
+        while not self._stop.is_set():
+            try:
+                queue.put(entry, timeout=0.1)
+                return
+            except Full:
+                continue
+
+    def _start_stage(self, name: str, count: int, func: Callable[[PipelineEntry], None],
+                     inbox: Queue, outbox: Queue, downstream_count: int):
+        def worker():
+            while True:
+                entry = self._get(inbox)
+                if entry is _DONE:
+                    break
+                if not entry.passthrough:
+                    try:
+                        func(entry)
+                    except Exception as e:
+                        entry.error = e
+                self._put(outbox, entry)
+
+        threads = [
+            threading.Thread(target=worker, name=f"{name}-{i}", daemon=True)
+            for i in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+
+        def close():
+            for thread in threads:
+                thread.join()
+            for _ in range(downstream_count):
+                self._put(outbox, _DONE)
+
+        threading.Thread(target=close, name=f"{name}-close", daemon=True).start()
+
+    def _read(self, entry: PipelineEntry):
+        if self.fetch:
+            # e.g. download from a cloud remote; runs on the reader threads so transfers overlap
+            self.fetch(entry)
+        if not os.path.exists(entry.path):
+            raise FileNotFoundError("File not found")
+        # Hash while reading so each file is read from disk exactly once
+        hasher = hashlib.blake2b(digest_size=32)
+        chunks = []
+        with open(entry.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            entry.size, entry.mtime_ns = stat.st_size, stat.st_mtime_ns
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(chunk)
+                chunks.append(chunk)
+        entry.data = b"".join(chunks)
+        entry.content_hash = hasher.hexdigest()
+        if self.is_duplicate and self.is_duplicate(entry.content_hash):
+            entry.duplicate = True
+
+    def _decode(self, entry: PipelineEntry):
+        # Pillow releases the GIL while decoding; JPEGs decode at reduced scale, near the model's input size
+        try:
+            image = decode_for_inference(entry.data, ai_service.input_size)
+        except Exception as e:
+            raise ValueError(f"Could not decode image: {e}")
+        # The raw bytes stay on the entry; the writer stores them instead of re-reading the file
+        entry.image = image
+        entry.phash = dhash(np.asarray(image.image.convert("L")))
+
+    def _infer(self, inbox: Queue, outbox: Queue):
+        finished = False
+        while not finished and not self._stop.is_set():
+            # Block for the first entry, then top the batch up for at most batch_wait seconds
+            batch = []
+            entry = self._get(inbox)
+            if entry is _DONE:
+                break
+            batch.append(entry)
+            deadline = time.perf_counter() + self.batch_wait
+            while len(batch) < self.batch_size:
+                try:
+                    entry = inbox.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except Empty:
+                    break
+                if entry is _DONE:
+                    finished = True
+                    break
+                batch.append(entry)
+
+            ready = [entry for entry in batch if not entry.passthrough]
+            if ready:
+                try:
+                    results = ai_service.detect_objects_batch(
+                        [entry.image for entry in ready],
+                        batch_size=self.batch_size,
+                        content_hashes=[entry.content_hash for entry in ready]
+                    )
+                    self.detect_seconds += ai_service.last_batch_stats["seconds"]
+                    self.detected += len(ready)
+                    for entry, detections in zip(ready, results):
+                        entry.detections = detections
+                        entry.model_key = ai_service.model_key
+                except Exception as e:
+                    for entry in ready:
+                        entry.error = e
+
+            for entry in batch:
+                entry.image = None
+                self._put(outbox, entry)
+
+        self._put(outbox, _DONE)
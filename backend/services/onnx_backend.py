@@ -0,0 +1,170 @@
+"""
+ONNX Runtime inference backend for AIService.
+
+The configured .pt weights (stock or trained) are exported to ONNX once and
+the export is cached next to them; it is redone only when the weights are
+newer than the export. onnxruntime is imported on first load only.
+"""
+import ast
+import os
+import threading
+from typing import List, Union
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+# Boxes of different classes are shifted this far apart so one NMS pass never merges them
+MAX_WH = 7680
+NMS_IOU = 0.7
+MAX_DETECTIONS = 300
+PAD_VALUE = 114
+
+_export_lock = threading.Lock()
+
+def onnx_path(model_path: str, quantize: bool = False) -> str:
+    stem = os.path.splitext(model_path)[0]
+    return f"{stem}.int8.onnx" if quantize else f"{stem}.onnx"
+
+def _is_current(export_path: str, model_path: str) -> bool:
+    if not os.path.exists(export_path):
+        return False
+    return not os.path.exists(model_path) or os.path.getmtime(export_path) >= os.path.getmtime(model_path)
+
+def export_onnx(model_path: str, quantize: bool = False) -> str:
+    """Path of the ONNX export of `model_path`, exporting (and quantizing) it first if needed"""
+    if model_path.endswith(".onnx"):
+        return model_path
+    with _export_lock:
+        fp32_path = onnx_path(model_path)
+        if not _is_current(fp32_path, model_path):
+            from ultralytics import YOLO
+            # Dynamic axes so import batches run as one session call
+            exported = YOLO(model_path).export(format="onnx", dynamic=True, simplify=True, verbose=False)
+            if os.path.abspath(exported) != os.path.abspath(fp32_path):
+                os.replace(exported, fp32_path)
+        if not quantize:
+            return fp32_path
+
+        int8_path = onnx_path(model_path, quantize=True)
+        if not _is_current(int8_path, fp32_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QUInt8)
+        return int8_path
+
+class OnnxDetector:
+    """
+    Runs an ultralytics YOLO detection export through onnxruntime, with the
+    same letterbox preprocessing and class-aware NMS as ultralytics.
+    """
+
+    def __init__(self, path: str, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 provider: str = "CPUExecutionProvider"):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        providers = [provider] if provider in ort.get_available_providers() else []
+        if "CPUExecutionProvider" not in providers:
+            providers.append("CPUExecutionProvider")
+
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+        self.imgsz = tuple(ast.literal_eval(metadata["imgsz"])) if "imgsz" in metadata else (640, 640)
+        self.stride = int(metadata.get("stride", 32))
+        # Exports with dynamic axes accept any stride-aligned input size
+        self.dynamic = any(isinstance(dim, str) for dim in self.session.get_inputs()[0].shape[2:])
+
+    def detect(self, images: List[Union[Image.Image, np.ndarray]], confidence: float) -> List[list]:
+        """Detections per image, as label/confidence/bbox dicts in original image pixels"""
+        images = [self._to_rgb(image) for image in images]
+        # Like ultralytics, pad only up to the stride when every image in the batch has the same shape
+        rect = self.dynamic and len({image.shape for image in images}) == 1
+        prepared = [self._letterbox(image, rect) for image in images]
+        batch = np.stack([tensor for tensor, _, _, _ in prepared])
+        output = self.session.run(None, {self.input_name: batch})[0]
+        return [
+            self._postprocess(prediction, confidence, scale, padding, shape)
+            for prediction, (_, scale, padding, shape) in zip(output, prepared)
+        ]
+
+    def _to_rgb(self, image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+        if isinstance(image, Image.Image):
+            # ultralytics applies the EXIF orientation to PIL inputs, so boxes are in upright pixels
+            return np.asarray(ImageOps.exif_transpose(image).convert("RGB"))
+        # numpy images are BGR, as in ultralytics
+        return np.ascontiguousarray(image[..., ::-1])
+
+    def _letterbox(self, image: np.ndarray, rect: bool):
+        height, width = image.shape[:2]
+        target_h, target_w = self.imgsz
+        scale = min(target_h / height, target_w / width)
+        new_w, new_h = round(width * scale), round(height * scale)
+        if (new_w, new_h) != (width, height):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        pad_x, pad_y = target_w - new_w, target_h - new_h
+        if rect:
+            pad_x, pad_y = pad_x % self.stride, pad_y % self.stride
+        pad_x, pad_y = pad_x / 2, pad_y / 2
+        top, left = round(pad_y - 0.1), round(pad_x - 0.1)
+        image = cv2.copyMakeBorder(
+            image, top, round(pad_y + 0.1), left, round(pad_x + 0.1),
+            cv2.BORDER_CONSTANT, value=(PAD_VALUE, PAD_VALUE, PAD_VALUE)
+        )
+        tensor = image.transpose(2, 0, 1).astype(np.float32) / 255.0
+        return tensor, scale, (left, top), (height, width)
+
+    def _postprocess(self, prediction: np.ndarray, confidence: float, scale: float, padding, shape) -> list:
+        # (4 + classes, anchors) -> (anchors, 4 + classes), boxes as centre x/y, width, height
+        prediction = prediction.T
+        scores = prediction[:, 4:]
+        classes = scores.argmax(axis=1)
+        best = scores[np.arange(len(scores)), classes]
+        keep = best > confidence
+        boxes, best, classes = prediction[keep, :4], best[keep], classes[keep]
+        if not len(boxes):
+            return []
+
+        xyxy = np.empty_like(boxes)
+        xyxy[:, :2] = boxes[:, :2] - boxes[:, 2:] / 2
+        xyxy[:, 2:] = boxes[:, :2] + boxes[:, 2:] / 2
+        selected = _nms(xyxy + classes[:, None] * MAX_WH, best, NMS_IOU)[:MAX_DETECTIONS]
+
+        xyxy = xyxy[selected]
+        xyxy[:, [0, 2]] -= padding[0]
+        xyxy[:, [1, 3]] -= padding[1]
+        xyxy /= scale
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+        return [
+            {
+                "label": self.names.get(int(cls), str(int(cls))),
+                "confidence": float(score),
+                "bbox": [float(value) for value in box]
+            }
+            for box, score, cls in zip(xyxy, best[selected], classes[selected])
+        ]
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> List[int]:
+    """Greedy non-maximum suppression; indices of the kept boxes, best first"""
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    kept = []
+    while len(order):
+        index, rest = order[0], order[1:]
+        kept.append(int(index))
+        x1 = np.maximum(boxes[index, 0], boxes[rest, 0])
+        y1 = np.maximum(boxes[index, 1], boxes[rest, 1])
+        x2 = np.minimum(boxes[index, 2], boxes[rest, 2])
+        y2 = np.minimum(boxes[index, 3], boxes[rest, 3])
+        intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+        iou = intersection / (areas[index] + areas[rest] - intersection + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return kept
+
+def load_onnx_detector(model_path: str, quantize: bool = False, intra_op_threads: int = 0,
+                       inter_op_threads: int = 0, provider: str = "CPUExecutionProvider") -> OnnxDetector:
+    return OnnxDetector(export_onnx(model_path, quantize), intra_op_threads, inter_op_threads, provider)
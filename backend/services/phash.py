@@ -0,0 +1,137 @@
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from PIL import Image, ImageOps
+from sqlmodel import Session, select
+from database import read_engine
+from models import Image as ImageRecord
+
+HASH_SIZE = 8
+
+def dhash(gray: np.ndarray) -> str:
+    """64-bit difference hash of a grayscale array, as 16 hex digits"""
+    # Imported here so OpenCV stays out of API startup
+    import cv2
+    small = cv2.resize(gray, (HASH_SIZE + 1, HASH_SIZE), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits).tobytes().hex()
+
+def dhash_file(path: str) -> str:
+    with Image.open(path) as img:
+        # The hash only needs a tiny image, so let JPEG decode at reduced scale
+        img.draft("L", (64, 64))
+        img = ImageOps.exif_transpose(img).convert("L")
+        return dhash(np.asarray(img))
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes; radius queries only visit branches that can match"""
+
+    def __init__(self):
+        # node: [hash, values, {distance: child}]
+        self._root = None
+        self.size = 0
+
+    def add(self, value_hash: int, value):
+        self.size += 1
+        if self._root is None:
+            self._root = [value_hash, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(value_hash, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value_hash, [value], {}]
+                return
+            node = child
+
+    def search(self, value_hash: int, max_distance: int) -> List[Tuple[int, object]]:
+        """All (distance, value) within max_distance of value_hash"""
+        results = []
+        if self._root is None:
+            return results
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value_hash, node[0])
+            if distance <= max_distance:
+                results.extend((distance, value) for value in node[1])
+            # Triangle inequality: only children at |d - k| <= max_distance can hold matches
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return results
+
+class PhashIndex:
+    """In-memory BK-tree of image perceptual hashes, loaded from the DB on first use"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tree = None
+        self._hashes: Dict[int, int] = {}
+
+    def _ensure_loaded(self):
+        if self._tree is not None:
+            return
+        tree = BKTree()
+        hashes = {}
+        with Session(read_engine) as session:
+            rows = session.exec(
+                select(ImageRecord.id, ImageRecord.phash).where(ImageRecord.phash.is_not(None))
+            ).all()
+        for image_id, phash in rows:
+            hashes[image_id] = int(phash, 16)
+            tree.add(hashes[image_id], image_id)
+        self._tree, self._hashes = tree, hashes
+
+    def add_many(self, images: Iterable[Tuple[int, Optional[str]]]):
+        with self._lock:
+            if self._tree is None:
+                # Loaded on first query, which will include these rows
+                return
+            for image_id, phash in images:
+                if phash and image_id not in self._hashes:
+                    self._hashes[image_id] = int(phash, 16)
+                    self._tree.add(self._hashes[image_id], image_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._tree = None
+            self._hashes = {}
+
+    def find_similar(self, phash: str, max_distance: int) -> List[Tuple[int, int]]:
+        """(distance, image_id) of every indexed image within max_distance bits"""
+        with self._lock:
+            self._ensure_loaded()
+            return sorted(self._tree.search(int(phash, 16), max_distance), key=lambda match: match[0])
+
+    def clusters(self, max_distance: int) -> List[List[int]]:
+        """Group image ids into connected components of near-duplicates"""
+        with self._lock:
+            self._ensure_loaded()
+            parent = {image_id: image_id for image_id in self._hashes}
+
+            def find(image_id):
+                while parent[image_id] != image_id:
+                    parent[image_id] = parent[parent[image_id]]
+                    image_id = parent[image_id]
+                return image_id
+
+            for image_id, value_hash in self._hashes.items():
+                for _, other_id in self._tree.search(value_hash, max_distance):
+                    root_a, root_b = find(image_id), find(other_id)
+                    if root_a != root_b:
+                        parent[max(root_a, root_b)] = min(root_a, root_b)
+
+            groups: Dict[int, List[int]] = {}
+            for image_id in self._hashes:
+                groups.setdefault(find(image_id), []).append(image_id)
+            return [sorted(group) for group in groups.values() if len(group) > 1]
+
+phash_index = PhashIndex()
@@ -1,36 +1,208 @@
+import atexit
+import os
+import secrets
+import socket
 import subprocess
-import json
-from typing import List, Dict, Any
+import threading
+import time
+from typing import List, Dict, Any, Callable, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from routers.settings import load_settings
 
 class RcloneService:
-    def __init__(self, rclone_path: str = "rclone"):
+    """
+    Talks to one long-lived `rclone rcd` over its HTTP rc API instead of
+    spawning an rclone process per call. The daemon is started on first use
+    (and restarted if it dies), bound to localhost with a random password.
+    Remote listings and configs are kept in a TTL cache; call `invalidate`
+    after changing a remote.
+    """
+
+    def __init__(self, rclone_path: str = "rclone", rc_port: int = 0, cache_ttl: float = 60.0,
+                 startup_timeout: float = 10.0):
         self.rclone_path = rclone_path
+        self.rc_port = rc_port
+        self.cache_ttl = cache_ttl
+        self.startup_timeout = startup_timeout
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._url = None
+        self._cache: Dict[tuple, tuple] = {}
+        self._cache_lock = threading.Lock()
+
+        self._session = requests.Session()
+        self._session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=16))
+        atexit.register(self.shutdown)
+
+    def _ensure_daemon(self) -> str:
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                return self._url
+
+            port = self.rc_port or self._free_port()
+            user, password = "collectibles", secrets.token_urlsafe(16)
+            try:
+                self._process = subprocess.Popen(
+                    [
+                        self.rclone_path, "rcd",
+                        f"--rc-addr=127.0.0.1:{port}",
+                        f"--rc-user={user}",
+                        f"--rc-pass={password}"
+                    ],
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL
+                )
+            except FileNotFoundError:
+                raise Exception("Rclone executable not found. Please install rclone and add it to your PATH.")
+            self._session.auth = (user, password)
+            self._url = f"http://127.0.0.1:{port}"
+
+            deadline = time.monotonic() + self.startup_timeout
+            while time.monotonic() < deadline:
+                if self._process.poll() is not None:
+                    raise Exception(f"Rclone daemon exited with code {self._process.returncode}")
+                try:
+                    self._session.post(f"{self._url}/core/pid", json={}, timeout=1).raise_for_status()
+                    return self._url
+                except requests.RequestException:
+                    time.sleep(0.1)
+            self._stop_process()
+            raise Exception("Rclone daemon did not start in time")
 
-    def _run_command(self, args: List[str]) -> Any:
-        try:
-            result = subprocess.run(
-                [self.rclone_path] + args,
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            return result.stdout
-        except subprocess.CalledProcessError as e:
-            print(f"Rclone error: {e.stderr}")
-            raise Exception(f"Rclone command failed: {e.stderr}")
-        except FileNotFoundError:
-             raise Exception("Rclone executable not found. Please install rclone and add it to your PATH.")
+    def _free_port(self) -> int:
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def _rc(self, command: str, **params) -> Dict[str, Any]:
+        """Call an rc command, restarting the daemon once if it has gone away"""
+        for attempt in range(2):
+            url = self._ensure_daemon()
+            try:
+                response = self._session.post(f"{url}/{command}", json=params, timeout=300)
+                break
+            except requests.ConnectionError:
+                if attempt:
+                    raise Exception("Rclone daemon is not reachable")
+                with self._lock:
+                    self._stop_process()
+        if response.status_code != 200:
+            try:
+                error = response.json().get("error", response.text)
+            except ValueError:
+                error = response.text
+            print(f"Rclone error: {error}")
+            raise Exception(f"Rclone command failed: {error}")
+        return response.json()
+
+    def _cached(self, key: tuple, loader: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._cache_lock:
+            hit = self._cache.get(key)
+            if hit and hit[0] > now:
+                return hit[1]
+        value = loader()
+        with self._cache_lock:
+            self._cache[key] = (now + self.cache_ttl, value)
+        return value
+
+    def invalidate(self, remote: Optional[str] = None, path: Optional[str] = None):
+        """Drop cached listings and stats: everything, one remote, or one path of a remote"""
+        with self._cache_lock:
+            if remote is None:
+                self._cache.clear()
+                return
+            remote = self._fs(remote)
+            for key in list(self._cache):
+                if key[0] in ("list", "stat") and key[1] == remote and (path is None or key[2] == path):
+                    del self._cache[key]
 
     def list_remotes(self) -> List[str]:
-        output = self._run_command(["listremotes"])
-        return [line.strip() for line in output.splitlines() if line.strip()]
+        return [f"{name}:" for name in self.remote_configs()]
+
+    def remote_configs(self) -> Dict[str, Dict[str, Any]]:
+        """Config of every remote by name, fetched in a single rc call"""
+        return self._cached(("config",), lambda: self._rc("config/dump"))
 
-    def list_files(self, remote: str, path: str = "") -> List[Dict[str, Any]]:
-        # Use lsjson for structured output
-        output = self._run_command(["lsjson", f"{remote}{path}"])
-        return json.loads(output)
+    def list_remote_types(self) -> List[Dict[str, str]]:
+        return [
+            {"name": f"{name}:", "type": config.get("type", "unknown")}
+            for name, config in self.remote_configs().items()
+        ]
+
+    def list_files(self, remote: str, path: str = "", refresh: bool = False) -> List[Dict[str, Any]]:
+        remote = self._fs(remote)
+        if refresh:
+            self.invalidate(remote, path)
+        return self._cached(
+            ("list", remote, path),
+            lambda: self._rc("operations/list", fs=remote, remote=path)["list"]
+        )
+
+    def list_tree(self, remote: str, path: str = "") -> List[Dict[str, Any]]:
+        """Every file below `path`, uncached since it feeds an import"""
+        return self._rc(
+            "operations/list", fs=self._fs(remote), remote=path,
+            opt={"recurse": True, "filesOnly": True, "noMimeType": True}
+        )["list"]
+
+    def stat(self, remote: str, path: str) -> Dict[str, Any]:
+        """Size, MimeType and ModTime of one remote object; raises FileNotFoundError if it does not exist"""
+        remote = self._fs(remote)
+        item = self._cached(
+            ("stat", remote, path),
+            lambda: self._rc("operations/stat", fs=remote, remote=path)["item"]
+        )
+        if item is None:
+            raise FileNotFoundError(f"{remote}{path} not found")
+        return item
+
+    def cat_command(self, remote: str, path: str, offset: int = 0, count: Optional[int] = None) -> List[str]:
+        """Command line that writes (a byte range of) a remote object to stdout"""
+        command = [self.rclone_path, "cat", f"--offset={offset}"]
+        if count is not None:
+            command.append(f"--count={count}")
+        return command + [f"{self._fs(remote)}{path}"]
 
     def copy_file(self, source: str, dest: str):
-        self._run_command(["copy", source, dest])
+        self._rc("sync/copy", srcFs=source, dstFs=dest)
+
+    def copy_to_local(self, source: str, dest_path: str):
+        """
+        Copy one remote object ("remote:path/to/file") to a local file.
+        rclone skips the transfer when an identical file is already there,
+        which is what lets an interrupted import resume without re-downloading.
+        """
+        remote, remote_path = source.split(":", 1)
+        dest_dir, dest_name = os.path.split(os.path.abspath(dest_path))
+        os.makedirs(dest_dir, exist_ok=True)
+        self._rc(
+            "operations/copyfile",
+            srcFs=f"{remote}:", srcRemote=remote_path,
+            dstFs=dest_dir, dstRemote=dest_name
+        )
+
+    def _fs(self, remote: str) -> str:
+        return remote if remote.endswith(":") else f"{remote}:"
+
+    def _stop_process(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._process = None
+
+    def shutdown(self):
+        with self._lock:
+            self._stop_process()
+
+cloud_settings = load_settings().cloud
 
-rclone_service = RcloneService()
+rclone_service = RcloneService(
+    rclone_path=cloud_settings.rclone_path,
+    rc_port=cloud_settings.rc_port,
+    cache_ttl=cloud_settings.cache_ttl_seconds
+)
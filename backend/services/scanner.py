@@ -0,0 +1,105 @@
+import os
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Tuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
+from database import read_session
+from models import ScanManifestEntry
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"}
+
+class ScannerService:
+    """
+    Walks directory trees and reports image files as it finds them.
+    Each file is compared with the manifest of files already imported: a file
+    is `unchanged` when its size and mtime still match the manifest, `changed`
+    when they do not, and `new` when it has never been imported.
+    """
+
+    def __init__(self, lookup_chunk: int = 500):
+        # Manifest lookups are batched; SQLite caps the number of bound parameters
+        self.lookup_chunk = lookup_chunk
+
+    def scan(self, root: str, recursive: bool = True, changed_only: bool = False,
+             include_dirs: bool = False) -> Iterator[dict]:
+        stack = [root]
+        while stack:
+            directory = stack.pop()
+            files = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if recursive:
+                                    stack.append(entry.path)
+                                if include_dirs:
+                                    yield {"type": "dir", "name": entry.name, "path": entry.path}
+                                continue
+                            if os.path.splitext(entry.name)[1].lower() not in IMAGE_EXTENSIONS:
+                                continue
+                            stat = entry.stat()
+                        except OSError as e:
+                            yield {"type": "error", "path": entry.path, "error": str(e)}
+                            continue
+                        files.append({
+                            "type": "file",
+                            "name": entry.name,
+                            "path": entry.path,
+                            "size": stat.st_size,
+                            "mtime_ns": stat.st_mtime_ns
+                        })
+                        if len(files) >= self.lookup_chunk:
+                            yield from self._classify(files, changed_only)
+                            files = []
+            except OSError as e:
+                yield {"type": "error", "path": directory, "error": str(e)}
+            yield from self._classify(files, changed_only)
+
+    def _classify(self, files: List[dict], changed_only: bool) -> Iterator[dict]:
+        if not files:
+            return
+        manifest = self._lookup([file["path"] for file in files])
+        for file in files:
+            known = manifest.get(file["path"])
+            if known is None:
+                file["status"] = "new"
+            elif known == (file["size"], file["mtime_ns"]):
+                file["status"] = "unchanged"
+            else:
+                file["status"] = "changed"
+            if not changed_only or file["status"] != "unchanged":
+                yield file
+
+    def _lookup(self, paths: List[str]) -> Dict[str, Tuple[int, int]]:
+        with read_session() as session:
+            rows = session.exec(
+                select(ScanManifestEntry.path, ScanManifestEntry.size, ScanManifestEntry.mtime_ns)
+                .where(ScanManifestEntry.path.in_(paths))
+            ).all()
+        return {path: (size, mtime_ns) for path, size, mtime_ns in rows}
+
+    def record(self, session: Session, files: Iterable[Tuple[str, int, int, str]]):
+        """Upsert (path, size, mtime_ns, content_hash) rows in the caller's transaction"""
+        now = datetime.utcnow()
+        rows = [
+            {"path": path, "size": size, "mtime_ns": mtime_ns, "content_hash": content_hash, "updated_at": now}
+            for path, size, mtime_ns, content_hash in files
+        ]
+        if not rows:
+            return
+        statement = sqlite_insert(ScanManifestEntry)
+        session.execute(
+            statement.on_conflict_do_update(
+                index_elements=["path"],
+                set_={
+                    "size": statement.excluded.size,
+                    "mtime_ns": statement.excluded.mtime_ns,
+                    "content_hash": statement.excluded.content_hash,
+                    "updated_at": statement.excluded.updated_at
+                }
+            ),
+            rows
+        )
+
+scanner_service = ScannerService()
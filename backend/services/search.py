@@ -0,0 +1,96 @@
+import re
+from typing import List, Tuple
+from sqlalchemy import text
+from database import engine, read_engine
+
+def _index(item_ids: str) -> str:
+    """SQL that adds index rows for the items selected by `item_ids`"""
+    return f"""
+        INSERT INTO item_fts (rowid, name, description, tags, category)
+        SELECT item.id, item.name, coalesce(item.description, ''),
+               coalesce((SELECT group_concat(tag.name, ' ') FROM itemtaglink
+                         JOIN tag ON tag.id = itemtaglink.tag_id
+                         WHERE itemtaglink.item_id = item.id), ''),
+               coalesce(category.name, '')
+        FROM item LEFT JOIN category ON category.id = item.category_id
+        WHERE item.id IN ({item_ids});
+    """
+
+def _reindex(item_ids: str) -> str:
+    return f"DELETE FROM item_fts WHERE rowid IN ({item_ids}); {_index(item_ids)}"
+
+# Triggers keep the index in step with every write path, including bulk imports and merges
+TRIGGERS = {
+    "item_fts_item_insert": f"AFTER INSERT ON item BEGIN {_reindex('NEW.id')} END",
+    "item_fts_item_update": f"AFTER UPDATE OF name, description, category_id ON item BEGIN {_reindex('NEW.id')} END",
+    "item_fts_item_delete": "AFTER DELETE ON item BEGIN DELETE FROM item_fts WHERE rowid = OLD.id; END",
+    "item_fts_tag_link_insert": f"AFTER INSERT ON itemtaglink BEGIN {_reindex('NEW.item_id')} END",
+    "item_fts_tag_link_delete": f"AFTER DELETE ON itemtaglink BEGIN {_reindex('OLD.item_id')} END",
+    "item_fts_category_update": (
+        f"AFTER UPDATE OF name ON category BEGIN "
+        f"{_reindex('SELECT id FROM item WHERE category_id = NEW.id')} END"
+    ),
+    "item_fts_category_delete": (
+        f"AFTER DELETE ON category BEGIN "
+        f"{_reindex('SELECT id FROM item WHERE category_id = OLD.id')} END"
+    ),
+}
+
+# bm25 weights for name, description, tags, category
+COLUMN_WEIGHTS = (10.0, 2.0, 5.0, 3.0)
+
+class SearchService:
+    """
+    SQLite FTS5 index over item names, descriptions, tag names (which hold
+    the detected labels) and category names.
+    """
+
+    def ensure_index(self):
+        """Create the index and its triggers, filling it from existing items on first run"""
+        with engine.begin() as connection:
+            exists = connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_fts'"
+            ).first()
+            connection.exec_driver_sql(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5("
+                "name, description, tags, category, "
+                "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            for name, body in TRIGGERS.items():
+                connection.exec_driver_sql(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+            if not exists:
+                self._rebuild(connection)
+
+    def rebuild(self):
+        with engine.begin() as connection:
+            self._rebuild(connection)
+
+    def _rebuild(self, connection):
+        connection.exec_driver_sql("DELETE FROM item_fts")
+        connection.exec_driver_sql(_index("SELECT id FROM item"))
+
+    def search(self, query: str, limit: int = 50, offset: int = 0) -> Tuple[List[int], int]:
+        """Item ids matching every word of `query` (as prefixes), best match first, and the total match count"""
+        match = self._match_expression(query)
+        if not match:
+            return [], 0
+        with read_engine.connect() as connection:
+            total = connection.execute(
+                text("SELECT count(*) FROM item_fts WHERE item_fts MATCH :match"),
+                {"match": match}
+            ).scalar()
+            item_ids = connection.execute(
+                text(
+                    f"SELECT rowid FROM item_fts WHERE item_fts MATCH :match "
+                    f"ORDER BY bm25(item_fts, {', '.join(map(str, COLUMN_WEIGHTS))}) "
+                    f"LIMIT :limit OFFSET :offset"
+                ),
+                {"match": match, "limit": limit, "offset": offset}
+            ).scalars().all()
+        return list(item_ids), total
+
+    def _match_expression(self, query: str) -> str:
+        # Quote each word so user input can never be parsed as FTS5 syntax
+        return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+search_service = SearchService()
@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Optional
+from sqlmodel import Session, select, func
+from database import read_engine
+from models import Item, Category, Image, Tag
+
+class StatsService:
+    """
+    In-process cache of the dashboard counters.
+    Write paths report their changes so the cached totals are adjusted in
+    place; a full recount only runs on first use and after `ttl` seconds,
+    which also corrects any drift from writes made outside this process.
+    """
+
+    def __init__(self, ttl: float = 300.0, recent_limit: int = 5):
+        self.ttl = ttl
+        self.recent_limit = recent_limit
+        self._lock = threading.Lock()
+        self._stats = None
+        self._computed_at = 0.0
+        self._recent = None
+
+    def get(self) -> dict:
+        with self._lock:
+            if self._stats is None or time.monotonic() - self._computed_at > self.ttl:
+                self._stats = self._compute()
+                self._computed_at = time.monotonic()
+                self._recent = None
+            if self._recent is None:
+                self._recent = self._recent_items()
+            stats = self._stats
+            return {
+                "total_items": stats["total_items"],
+                "total_categories": len(stats["categories"]),
+                "total_images": stats["total_images"],
+                "total_tags": stats["total_tags"],
+                "recent_items": self._recent,
+                "category_stats": [
+                    {"category": category["name"], "count": category["count"]}
+                    for category in stats["categories"].values()
+                ]
+            }
+
+    def invalidate(self):
+        with self._lock:
+            self._stats = None
+            self._recent = None
+
+    def record_items_added(self, category_id: Optional[int], items: int, images: int, tags: int = 0):
+        with self._lock:
+            self._recent = None
+            if self._stats is None:
+                return
+            self._stats["total_items"] += items
+            self._stats["total_images"] += images
+            self._stats["total_tags"] += tags
+            if category_id in self._stats["categories"]:
+                self._stats["categories"][category_id]["count"] += items
+
+    def record_item_deleted(self, category_id: Optional[int], images: int = 0):
+        # `images` is how many Image rows went with the item; consolidation moves them instead
+        self.record_items_added(category_id, -1, -images)
+
+    def record_item_updated(self, old_category_id: Optional[int], new_category_id: Optional[int]):
+        with self._lock:
+            # Name/description may have changed, which the recent list shows
+            self._recent = None
+            if self._stats is None or old_category_id == new_category_id:
+                return
+            categories = self._stats["categories"]
+            if old_category_id in categories:
+                categories[old_category_id]["count"] -= 1
+            if new_category_id in categories:
+                categories[new_category_id]["count"] += 1
+
+    def record_category_created(self, category: Category):
+        with self._lock:
+            if self._stats is not None:
+                self._stats["categories"][category.id] = {"name": category.name, "count": 0}
+
+    def record_category_deleted(self, category_id: int):
+        with self._lock:
+            if self._stats is not None:
+                self._stats["categories"].pop(category_id, None)
+
+    def _compute(self) -> dict:
+        with Session(read_engine) as session:
+            # All totals in one statement
+            total_items, total_images, total_tags = session.exec(
+                select(
+                    select(func.count(Item.id)).scalar_subquery(),
+                    select(func.count(Image.id)).scalar_subquery(),
+                    select(func.count(Tag.id)).scalar_subquery()
+                )
+            ).one()
+
+            # Items by category in one GROUP BY
+            rows = session.exec(
+                select(Category.id, Category.name, func.count(Item.id))
+                .outerjoin(Item, Item.category_id == Category.id)
+                .group_by(Category.id)
+                .order_by(Category.id)
+            ).all()
+
+        return {
+            "total_items": total_items,
+            "total_images": total_images,
+            "total_tags": total_tags,
+            "categories": {
+                category_id: {"name": name, "count": count}
+                for category_id, name, count in rows
+            }
+        }
+
+    def _recent_items(self) -> list:
+        with Session(read_engine) as session:
+            rows = session.exec(
+                select(Item.id, Item.name, Item.description, Item.category_id, Item.created_at)
+                .order_by(Item.created_at.desc())
+                .limit(self.recent_limit)
+            ).all()
+        return [
+            {
+                "id": item_id,
+                "name": name,
+                "description": description,
+                "category_id": category_id,
+                "created_at": created_at
+            }
+            for item_id, name, description, category_id, created_at in rows
+        ]
+
+stats_service = StatsService()
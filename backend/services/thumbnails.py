@@ -0,0 +1,98 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Tuple
+from PIL import Image, ImageOps
+from services.disk_cache import DiskLRUCache
+
+DERIVATIVE_SIZES = {
+    "thumb": 256,
+    "preview": 1024,
+}
+
+FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+class ThumbnailService:
+    """
+    Generates downscaled derivatives of log images and keeps them in a
+    content-addressed cache directory (keyed by a hash of the source bytes),
+    evicting least recently used files once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir: str = "../data/derivatives", max_bytes: int = 2 * 1024 ** 3,
+                 image_format: str = "webp", quality: int = 80):
+        self.files = DiskLRUCache(cache_dir, max_bytes)
+        self.image_format = image_format
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._source_hashes = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="thumbnails")
+
+    @property
+    def media_type(self) -> str:
+        return FORMATS[self.image_format][1]
+
+    def get_derivative(self, source_path: str, size: str) -> Tuple[Path, str]:
+        """Return (path, etag) of the derivative, generating it on first request"""
+        if size not in DERIVATIVE_SIZES:
+            raise ValueError(f"Unknown derivative size: {size}")
+
+        digest = self._source_hash(source_path)
+        etag = f"{digest}-{size}-{self.image_format}"
+        path = self.files.path_for(etag, f".{self.image_format}")
+        if self.files.lookup(path):
+            return path, etag
+
+        self._render(source_path, path, DERIVATIVE_SIZES[size])
+        self.files.add(path)
+        return path, etag
+
+    def pregenerate(self, source_paths: Iterable[str]):
+        """Render all derivative sizes in the background, e.g. right after an import"""
+        for source_path in source_paths:
+            for size in DERIVATIVE_SIZES:
+                self._executor.submit(self._pregenerate_one, source_path, size)
+
+    def _pregenerate_one(self, source_path: str, size: str):
+        try:
+            self.get_derivative(source_path, size)
+        except Exception as e:
+            print(f"Thumbnail generation failed for {source_path}: {e}")
+
+    def _source_hash(self, source_path: str) -> str:
+        stat = os.stat(source_path)
+        key = (source_path, stat.st_size, stat.st_mtime_ns)
+        digest = self._source_hashes.get(key)
+        if digest is None:
+            hasher = hashlib.blake2b(digest_size=16)
+            with open(source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    hasher.update(chunk)
+            digest = hasher.hexdigest()
+            with self._lock:
+                self._source_hashes[key] = digest
+                if len(self._source_hashes) > 10000:
+                    self._source_hashes.popitem(last=False)
+        return digest
+
+    def _render(self, source_path: str, dest_path: Path, max_size: int):
+        with Image.open(source_path) as img:
+            # Let the JPEG decoder skip straight to a reduced scale when possible
+            img.draft("RGB", (max_size, max_size))
+            img = ImageOps.exif_transpose(img)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+            dest_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = dest_path.with_suffix(f".{threading.get_ident()}.tmp")
+            img.save(tmp_path, format=FORMATS[self.image_format][0], quality=self.quality)
+            os.replace(tmp_path, dest_path)
+
+thumbnail_service = ThumbnailService()
@@ -1,114 +1,220 @@
+import json
 import os
+import signal
+import subprocess
+import sys
 import threading
 import time
-from ultralytics import YOLO
-import shutil
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RUNS_DIR = (BACKEND_DIR / "../data/training_runs").resolve()
 
 class TrainingService:
-    def __init__(self):
+    """
+    Runs training in a supervised subprocess (services/training_worker.py),
+    so it never competes with the API for the GIL and can be killed outright.
+    Each run gets its own directory under training_runs holding the weights,
+    the worker's log and a metrics.jsonl stream of per-epoch events.
+    """
+
+    def __init__(self, poll_interval: float = 0.5, stop_timeout: float = 5.0):
+        self.poll_interval = poll_interval
+        self.stop_timeout = stop_timeout
         self.is_training = False
         self.status = "idle"
         self.progress = 0
         self.current_epoch = 0
         self.total_epochs = 0
         self.logs = []
-        self.model = None
-        self.stop_event = threading.Event()
+        self.events = []
+        self.history = []
+        self.run_dir = None
+        self.process = None
         self.thread = None
+        self._stop_requested = False
+        self._lock = threading.Lock()
 
     def start_training(self, data_path: str, epochs: int = 10, batch_size: int = 16, model_name: str = "yolov8n.pt"):
-        if self.is_training:
-            raise Exception("Training is already in progress")
+        with self._lock:
+            if self.is_training:
+                raise Exception("Training is already in progress")
+            self.is_training = True
 
-        self.is_training = True
         self.status = "starting"
         self.progress = 0
         self.current_epoch = 0
         self.total_epochs = epochs
         self.logs = []
-        self.stop_event.clear()
+        self.events = []
+        self.history = []
+        self._stop_requested = False
+
+        try:
+            self.run_dir = self._new_run_dir()
+            config_path = self.run_dir / "config.json"
+            with open(config_path, "w") as f:
+                json.dump({
+                    "data_path": os.path.abspath(data_path),
+                    "epochs": epochs,
+                    "batch_size": batch_size,
+                    "model_name": model_name,
+                    "project": str(self.run_dir.parent),
+                    "name": self.run_dir.name,
+                    "metrics_path": str(self.run_dir / "metrics.jsonl")
+                }, f, indent=2)
+
+            log_file = open(self.run_dir / "train.log", "wb")
+            try:
+                self.process = subprocess.Popen(
+                    [sys.executable, "-m", "services.training_worker", str(config_path)],
+                    cwd=BACKEND_DIR,
+                    stdout=log_file,
+                    stderr=subprocess.STDOUT,
+                    # Own process group, so a stop also takes down dataloader workers
+                    **self._process_group_kwargs()
+                )
+            finally:
+                log_file.close()
+        except Exception:
+            self.is_training = False
+            self.status = "error"
+            raise
 
-        self.thread = threading.Thread(
-            target=self._train_process,
-            args=(data_path, epochs, batch_size, model_name)
-        )
+        self.logs.append(f"Starting training with model {model_name} on {data_path} in {self.run_dir.name}")
+        self.thread = threading.Thread(target=self._supervise, name="training-supervisor", daemon=True)
         self.thread.start()
 
     def stop_training(self):
-        if not self.is_training:
+        process = self.process
+        if not self.is_training or process is None:
             return
-        
+
         self.status = "stopping"
-        self.stop_event.set()
-        # Note: YOLOv8 doesn't have a clean "stop" method for the train loop exposed easily 
-        # without custom callbacks, but we can flag it. 
-        # For now, we might just have to wait or kill the process if we were using multiprocessing.
-        # Since we are using threading, we rely on the loop checking the flag if we were writing a custom loop.
-        # But ultralytics train() is blocking. 
-        # We can't easily interrupt it safely from a thread without killing the app or using a subprocess.
-        # For this MVP, "stop" might just update status and let it finish or require restart.
-        # A better approach for production is running training in a separate process.
-        
-        self.logs.append("Stop requested. Training will stop after current operation or requires restart.")
-        self.is_training = False # Force flag
-        self.status = "stopped"
-
-    def _train_process(self, data_path: str, epochs: int, batch_size: int, model_name: str):
+        self._stop_requested = True
+        self.logs.append("Stop requested, terminating training process")
+        self._signal_tree(process, force=False)
         try:
-            self.status = "training"
-            self.logs.append(f"Starting training with model {model_name} on {data_path}")
-            
-            # Initialize model
-            self.model = YOLO(model_name)
-            
-            # Add a custom callback to track progress if possible, 
-            # or just run it and assume it works.
-            # Ultralytics supports callbacks.
-            
-            def on_train_epoch_end(trainer):
-                self.current_epoch = trainer.epoch + 1
-                self.progress = (self.current_epoch / self.total_epochs) * 100
-                self.logs.append(f"Epoch {self.current_epoch}/{self.total_epochs} completed")
-                
-                if self.stop_event.is_set():
-                    raise InterruptedError("Training stopped by user")
-
-            self.model.add_callback("on_train_epoch_end", on_train_epoch_end)
-
-            # Run training
-            # data_path should be a yaml file
-            results = self.model.train(
-                data=data_path,
-                epochs=epochs,
-                batch=batch_size,
-                imgsz=640,
-                project="../data/training_runs",
-                name="custom_run",
-                exist_ok=True # Overwrite existing run for simplicity in this MVP
-            )
-            
+            process.wait(timeout=self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            self._signal_tree(process, force=True)
+            process.wait()
+        if self.thread:
+            self.thread.join(timeout=self.stop_timeout)
+
+    def _new_run_dir(self) -> Path:
+        RUNS_DIR.mkdir(parents=True, exist_ok=True)
+        base = f"run_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        name, suffix = base, 1
+        while True:
+            try:
+                (RUNS_DIR / name).mkdir()
+                return RUNS_DIR / name
+            except FileExistsError:
+                suffix += 1
+                name = f"{base}_{suffix}"
+
+    def _process_group_kwargs(self) -> dict:
+        if os.name == "nt":
+            return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        return {"start_new_session": True}
+
+    def _signal_tree(self, process: subprocess.Popen, force: bool):
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == "nt":
+                command = ["taskkill", "/T", "/PID", str(process.pid)]
+                subprocess.run(command + (["/F"] if force else []), capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGKILL if force else signal.SIGTERM)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _supervise(self):
+        """Follow the worker's metrics file until the process exits"""
+        process = self.process
+        metrics_path = self.run_dir / "metrics.jsonl"
+        position = 0
+        completed = False
+        error = None
+        while True:
+            exited = process.poll() is not None
+            if metrics_path.exists():
+                with open(metrics_path) as f:
+                    f.seek(position)
+                    while True:
+                        line = f.readline()
+                        # A line without its newline is still being written
+                        if not line.endswith("\n"):
+                            break
+                        position = f.tell()
+                        event = json.loads(line)
+                        completed = completed or event["event"] == "completed"
+                        error = event.get("error", error)
+                        self._handle_event(event)
+            if exited:
+                break
+            time.sleep(self.poll_interval)
+
+        if self._stop_requested:
+            self.status = "stopped"
+            self.logs.append("Training stopped")
+        elif process.returncode == 0 and completed:
             self.status = "completed"
             self.progress = 100
             self.logs.append("Training completed successfully")
-            
-        except InterruptedError:
-            self.status = "stopped"
-            self.logs.append("Training stopped")
-        except Exception as e:
+        else:
             self.status = "error"
-            self.logs.append(f"Error: {str(e)}")
-            print(f"Training error: {e}")
-        finally:
-            self.is_training = False
+            self.logs.append(f"Error: {error or f'training process exited with code {process.returncode}'}")
+            self.logs.extend(self._log_tail())
+        self._record_event({"event": "finished", "status": self.status, "time": time.time()})
+        self.is_training = False
+
+    def _handle_event(self, event: dict):
+        if event["event"] == "started":
+            self.status = "training"
+        elif event["event"] == "epoch":
+            self.current_epoch = event["epoch"]
+            self.total_epochs = event["epochs"]
+            self.progress = self.current_epoch / self.total_epochs * 100
+            self.history.append({"epoch": event["epoch"], **event["metrics"]})
+            self.logs.append(f"Epoch {self.current_epoch}/{self.total_epochs} completed")
+        self._record_event(event)
+
+    def _record_event(self, event: dict):
+        with self._lock:
+            self.events.append({"id": len(self.events) + 1, **event})
+
+    def _log_tail(self, lines: int = 10) -> list:
+        try:
+            with open(self.run_dir / "train.log", errors="replace") as f:
+                return [line.rstrip() for line in f.readlines()[-lines:]]
+        except OSError:
+            return []
+
+    def events_since(self, last_id: int) -> list:
+        with self._lock:
+            return self.events[last_id:]
 
     def get_status(self):
-        return {
+        latest = self.history[-1] if self.history else {}
+        status = {
             "is_training": self.is_training,
             "status": self.status,
             "progress": self.progress,
             "current_epoch": self.current_epoch,
             "total_epochs": self.total_epochs,
+            "run_dir": str(self.run_dir) if self.run_dir else None,
+            "metrics": {key: value for key, value in latest.items() if key != "epoch"},
+            "history": self.history,
             "logs": self.logs[-50:] # Return last 50 logs
         }
+        epoch_times = [epoch["epoch_time"] for epoch in self.history if epoch.get("epoch_time")]
+        if self.is_training and epoch_times:
+            remaining = sum(epoch_times) / len(epoch_times) * (self.total_epochs - self.current_epoch)
+            status["time_remaining"] = time.strftime("%H:%M:%S", time.gmtime(remaining))
+        return status
 
 training_service = TrainingService()
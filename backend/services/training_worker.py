@@ -0,0 +1,59 @@
+"""
+Training subprocess started by TrainingService:
+
+    python -m services.training_worker <config.json>
+
+Writes one JSON event per line to the run's metrics file as training
+progresses; everything ultralytics prints goes to the run's log file.
+"""
+import json
+import sys
+import time
+from ultralytics import YOLO
+
+def _number(value) -> float:
+    return round(float(value), 5)
+
+def main(config_path: str):
+    with open(config_path) as f:
+        config = json.load(f)
+
+    with open(config["metrics_path"], "a", buffering=1) as metrics:
+        def emit(event: str, **data):
+            metrics.write(json.dumps({"event": event, "time": time.time(), **data}) + "\n")
+
+        def on_fit_epoch_end(trainer):
+            # Fires after validation, so the epoch's mAP is available
+            epoch_time = getattr(trainer, "epoch_time", None) or 0.0
+            images = len(trainer.train_loader.dataset) if trainer.train_loader else 0
+            values = {"epoch_time": _number(epoch_time)}
+            if epoch_time:
+                values["images_per_sec"] = _number(images / epoch_time)
+            for key, value in trainer.label_loss_items(trainer.tloss, prefix="train").items():
+                values[key.split("/")[-1]] = _number(value)
+            for key, value in (trainer.metrics or {}).items():
+                if key.startswith("metrics/"):
+                    values[key.split("/")[-1].replace("(B)", "")] = _number(value)
+            emit("epoch", epoch=trainer.epoch + 1, epochs=trainer.epochs, metrics=values)
+
+        try:
+            model = YOLO(config["model_name"])
+            model.add_callback("on_fit_epoch_end", on_fit_epoch_end)
+            emit("started", model=config["model_name"], data=config["data_path"])
+            model.train(
+                data=config["data_path"],
+                epochs=config["epochs"],
+                batch=config["batch_size"],
+                imgsz=640,
+                project=config["project"],
+                name=config["name"],
+                # The run directory was created by the service and is unique to this run
+                exist_ok=True
+            )
+            emit("completed", best=str(getattr(model.trainer, "best", "")))
+        except Exception as e:
+            emit("error", error=str(e))
+            raise
+
+if __name__ == "__main__":
+    main(sys.argv[1])
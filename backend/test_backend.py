@@ -1,7 +1,22 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
 import requests
 
 BASE_URL = "http://127.0.0.1:8000"
 
+# Importing the app must stay cheap: ML frameworks and model weights load on first use
+IMPORT_BUDGET_SECONDS = 3.0
+HEAVY_MODULES = ("torch", "ultralytics", "rembg", "onnxruntime", "cv2")
+
+# The ONNX backend must find the same objects as PyTorch on these images
+PARITY_IMAGE_DIR = "../data"
+PARITY_MAX_IMAGES = 8
+PARITY_MIN_IOU = 0.9
+PARITY_MAX_CONFIDENCE_DELTA = 0.05
+
 def test_root():
     try:
         response = requests.get(f"{BASE_URL}/")
@@ -19,6 +34,225 @@ def test_files_list():
     except Exception as e:
         print(f"Files list endpoint failed: {e}")
 
+def test_import_time():
+    code = (
+        "import sys, time; start = time.perf_counter(); import main; "
+        "print(time.perf_counter() - start); "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    lines = result.stdout.splitlines()
+    seconds, heavy = float(lines[-2]), lines[-1]
+    print(f"Import time: {seconds:.2f}s (budget {IMPORT_BUDGET_SECONDS}s), heavy modules loaded: {heavy or 'none'}")
+    assert not heavy, f"Importing main loaded {heavy}"
+    assert seconds < IMPORT_BUDGET_SECONDS, f"Importing main took {seconds:.2f}s"
+
+def _run_import(files, on_duplicate="skip"):
+    from services.import_jobs import import_job_service
+    job_id = import_job_service.create_job(files, category_name="Books", on_duplicate=on_duplicate)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        job = import_job_service.get_job(job_id, include_files=True)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"Import job {job_id} did not finish")
+
+def _import_scenario():
+    """Runs inside a scratch backend directory, so ../data is a fresh database and log directory"""
+    from PIL import Image as PILImage
+    from sqlmodel import Session, select
+    from database import create_db_and_tables, engine
+    from models import Detection, Image, Item, Tag
+    from services.ai import ai_service
+    from services.stats import stats_service
+
+    # Stub the detector so the test exercises the import path without model weights
+    def detect_objects_batch(images, batch_size=None, content_hashes=None):
+        return [[{"label": "book", "confidence": 0.9, "bbox": [0.0, 0.0, 8.0, 8.0]}] for _ in images]
+    ai_service.detect_objects_batch = detect_objects_batch
+    create_db_and_tables()
+
+    files = []
+    for index, color in enumerate(("red", "blue")):
+        path = os.path.abspath(f"source_{index}.jpg")
+        PILImage.new("RGB", (32, 32), color).save(path)
+        files.append(path)
+
+    job = _run_import(files)
+    assert (job["status"], job["imported"], job["failed"]) == ("completed", 2, 0), job
+    with Session(engine) as session:
+        assert session.exec(select(Tag.name)).all() == ["book"]
+        assert len(session.exec(select(Item)).all()) == 2
+        assert len(session.exec(select(Image)).all()) == 2
+        assert len(session.exec(select(Detection)).all()) == 2
+    # Cached from here on, so later counts come from the in-place adjustments
+    assert (stats_service.get()["total_items"], stats_service.get()["total_images"]) == (2, 2)
+
+    # The same content again is a duplicate of the stored items
+    job = _run_import(files[:1])
+    assert (job["imported"], job["files"][0]["status"]) == (0, "skipped"), job
+    # Linking points it at that item without counting it as a new one
+    job = _run_import(files[:1], on_duplicate="link")
+    assert (job["imported"], job["files"][0]["status"]) == (0, "linked"), job
+
+    # Once its item is deleted, the file is new content again
+    from routers.items import delete_item
+    delete_item(job["files"][0]["item_id"])
+    stats = stats_service.get()
+    assert (stats["total_items"], stats["total_images"]) == (1, 1), stats
+    job = _run_import(files[:1])
+    assert (job["imported"], job["failed"]) == (1, 0), job
+
+    # Images orphaned by older versions of delete must not block a re-import either
+    with Session(engine) as session:
+        image = session.exec(select(Image).where(Image.item_id == job["files"][0]["item_id"])).one()
+        image.item_id = None
+        session.add(image)
+        session.commit()
+    job = _run_import(files[:1])
+    assert (job["imported"], job["failed"]) == (1, 0), job
+    print("Import: 2 files imported with detections, duplicate skipped or linked, re-import after delete accepted")
+
+def test_import_job():
+    with tempfile.TemporaryDirectory() as scratch:
+        workdir = os.path.join(scratch, "backend")
+        os.makedirs(workdir)
+        backend_dir = os.path.dirname(os.path.abspath(__file__))
+        result = subprocess.run(
+            [sys.executable, "-c", "import test_backend; test_backend._import_scenario()"],
+            cwd=workdir,
+            env={**os.environ, "PYTHONPATH": backend_dir},
+            capture_output=True,
+            text=True
+        )
+        print(result.stdout.strip().splitlines()[-1] if result.stdout.strip() else "")
+        assert result.returncode == 0, result.stderr[-2000:]
+
+def test_reload_during_detection():
+    import threading
+    import numpy as np
+    from services.ai import AIService
+
+    class StubModel:
+        names = {}
+
+        def detect(self, images, confidence):
+            return [[] for _ in images]
+
+    class SlowLock:
+        """Pauses after acquiring, so a reload lands while detection holds the inference lock"""
+
+        def __init__(self):
+            self.lock = threading.Lock()
+
+        def __enter__(self):
+            self.lock.acquire()
+            time.sleep(0.2)
+
+        def __exit__(self, *exc):
+            self.lock.release()
+
+    # A cold service whose models load instantly and never touch the disk
+    service = AIService("yolov8n.pt")
+    service._load = lambda model_path, backend, quantize: StubModel()
+    service._lock = SlowLock()
+    detect = threading.Thread(
+        target=service.detect_objects_batch,
+        args=([np.zeros((8, 8, 3), dtype=np.uint8)],),
+        kwargs={"content_hashes": [None]},
+        daemon=True
+    )
+    reload = threading.Thread(target=service.reload_model, args=("yolov8s.pt",), daemon=True)
+    detect.start()
+    time.sleep(0.05)
+    reload.start()
+    detect.join(5)
+    reload.join(5)
+    assert not detect.is_alive() and not reload.is_alive(), "detection and model reload deadlocked"
+    print("Reload during cold detection: no deadlock")
+
+def test_load_error_reported():
+    from services.ai import AIService
+
+    def load(model_path, backend, quantize):
+        raise ConnectionError("weights unavailable")
+
+    service = AIService("yolov8n.pt")
+    service._load = load
+    service.warm_up()
+    assert service.state == "error"
+    assert service.last_load_error == "Failed to load yolov8n.pt: weights unavailable", service.last_load_error
+    print("Failed model load: reported as", service.last_load_error)
+
+def _iou(a, b):
+    width = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    height = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union if union else 0.0
+
+def test_onnx_parity(model_path="yolov8n.pt"):
+    from services.ai import AIService
+
+    paths = []
+    for root, _, files in os.walk(PARITY_IMAGE_DIR):
+        paths.extend(os.path.join(root, name) for name in sorted(files) if name.lower().endswith((".jpg", ".jpeg", ".png")))
+    paths = paths[:PARITY_MAX_IMAGES]
+    if not paths:
+        print(f"ONNX parity: no images found under {PARITY_IMAGE_DIR}, skipped")
+        return
+
+    images = []
+    for path in paths:
+        with open(path, "rb") as f:
+            images.append(f.read())
+    torch_service = AIService(model_path)
+    try:
+        torch_service.model
+    except OSError as e:
+        # Stock weights are downloaded on first use, which fails offline
+        print(f"ONNX parity: {model_path} unavailable ({e}), skipped")
+        return
+    onnx_service = AIService(model_path, backend="onnx")
+    # No content hashes, so both backends really run instead of answering from the detection cache
+    torch_results = torch_service.detect_objects_batch(images, content_hashes=[None] * len(images))
+    onnx_results = onnx_service.detect_objects_batch(images, content_hashes=[None] * len(images))
+
+    def borderline(detection):
+        # Scores this close to the threshold may land on either side of it
+        return detection["confidence"] < torch_service.confidence + PARITY_MAX_CONFIDENCE_DELTA
+
+    for path, expected, actual in zip(paths, torch_results, onnx_results):
+        unmatched = list(actual)
+        for detection in expected:
+            match = max(
+                (candidate for candidate in unmatched if candidate["label"] == detection["label"]),
+                key=lambda candidate: _iou(candidate["bbox"], detection["bbox"]),
+                default=None
+            )
+            if match is None and borderline(detection):
+                continue
+            assert match is not None, f"{path}: ONNX missed {detection['label']}"
+            assert _iou(match["bbox"], detection["bbox"]) >= PARITY_MIN_IOU, f"{path}: {detection['label']} box differs"
+            assert abs(match["confidence"] - detection["confidence"]) <= PARITY_MAX_CONFIDENCE_DELTA, \
+                f"{path}: {detection['label']} confidence differs"
+            unmatched.remove(match)
+        extra = [candidate["label"] for candidate in unmatched if not borderline(candidate)]
+        assert not extra, f"{path}: ONNX found extra {extra}"
+    print(f"ONNX parity: {len(paths)} images, {sum(map(len, torch_results))} detections match")
+
 if __name__ == "__main__":
+    test_import_time()
+    test_import_job()
+    test_reload_during_detection()
+    test_load_error_reported()
     test_root()
     test_files_list()
+    test_onnx_parity()
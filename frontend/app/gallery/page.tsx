@@ -7,16 +7,22 @@ export default function GalleryPage() {
     const [filter, setFilter] = useState('all');
     const [items, setItems] = useState<any[]>([]);
     const [loading, setLoading] = useState(true);
+    const [query, setQuery] = useState('');
 
     const categories = ['All', 'Magazines', 'Comic Books', 'Stamps', 'Trading Cards', 'Coins'];
 
     useEffect(() => {
-        fetchItems();
-    }, []);
+        // Debounce so typing does not fire a request per keystroke
+        const timer = setTimeout(() => fetchItems(query.trim()), 200);
+        return () => clearTimeout(timer);
+    }, [query]);
 
-    const fetchItems = async () => {
+    const fetchItems = async (search: string) => {
         try {
-            const response = await fetch('http://localhost:8000/items/');
+            const url = search
+                ? `http://localhost:8000/items/search?q=${encodeURIComponent(search)}`
+                : 'http://localhost:8000/items/';
+            const response = await fetch(url);
             const data = await response.json();
             setItems(data);
         } catch (error) {
@@ -62,6 +68,8 @@ export default function GalleryPage() {
                             type="text"
                             placeholder="Search items..."
                             className="w-full px-4 py-2 border rounded"
+                            value={query}
+                            onChange={(e) => setQuery(e.target.value)}
                         />
                     </div>
                 </div>
@@ -90,7 +98,7 @@ export default function GalleryPage() {
                                         <div className="aspect-square bg-gray-200 flex items-center justify-center overflow-hidden">
                                             {item.images && item.images.length > 0 ? (
                                                 <img
-                                                    src={`http://localhost:8000/images/${item.images[0].filename}`}
+                                                    src={`http://localhost:8000${item.images[0].thumbnail_url}`}
                                                     alt={item.name}
                                                     className="w-full h-full object-cover"
                                                 />
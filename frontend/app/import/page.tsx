@@ -10,6 +10,7 @@ export default function ImportPage() {
     const [selectedFiles, setSelectedFiles] = useState<Set<string>>(new Set());
     const [importing, setImporting] = useState(false);
     const [importResult, setImportResult] = useState<any>(null);
+    const [importJob, setImportJob] = useState<any>(null);
     const [category, setCategory] = useState('');
     const [deleteOriginal, setDeleteOriginal] = useState(false);
 
@@ -52,7 +53,27 @@ export default function ImportPage() {
                 body: formData,
             });
 
-            const result = await response.json();
+            const { job_id } = await response.json();
+
+            // Poll the background import job until it finishes
+            let job: any = null;
+            while (true) {
+                const jobResponse = await fetch(`http://localhost:8000/jobs/${job_id}`);
+                job = await jobResponse.json();
+                setImportJob(job);
+                if (job.status === 'completed' || job.status === 'failed') break;
+                await new Promise(resolve => setTimeout(resolve, 1000));
+            }
+
+            const detailResponse = await fetch(`http://localhost:8000/jobs/${job_id}?include_files=true`);
+            const detail = await detailResponse.json();
+            const result = {
+                success: detail.status === 'completed',
+                imported_count: detail.imported,
+                items: detail.files
+                    .filter((f: any) => f.status === 'done')
+                    .map((f: any) => ({ name: f.path.split(/[\\/]/).pop(), detections: f.detections })),
+            };
             setImportResult(result);
 
             if (result.success) {
@@ -66,6 +87,7 @@ export default function ImportPage() {
             alert('Error importing items. Check console for details.');
         } finally {
             setImporting(false);
+            setImportJob(null);
         }
     };
 
@@ -178,6 +200,12 @@ export default function ImportPage() {
                             </div>
                         )}
 
+                        {importing && importJob && (
+                            <div className="mt-4 p-4 rounded bg-blue-50 border border-blue-200 text-sm">
+                                Importing {importJob.processed}/{importJob.total} ({importJob.progress}%) · {importJob.images_per_sec} images/sec
+                            </div>
+                        )}
+
                         {importResult && (
                             <div className={`mt-4 p-4 rounded ${importResult.success ? 'bg-green-50 border border-green-200' : 'bg-red-50 border border-red-200'}`}>
                                 <h3 className="font-semibold mb-2">
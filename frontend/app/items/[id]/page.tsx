@@ -193,7 +193,7 @@ export default function ItemDetailPage() {
                                     <div key={image.id} className="border rounded p-2">
                                         <div className="aspect-square bg-gray-200 rounded mb-2 flex items-center justify-center overflow-hidden">
                                             <img
-                                                src={`http://localhost:8000/images/${image.filename}`}
+                                                src={`http://localhost:8000${image.preview_url}`}
                                                 alt={image.filename}
                                                 className="w-full h-full object-cover"
                                             />